@@ -8,15 +8,20 @@ can be used for system health checks.
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from src.routers import query_router, docs_router
-from src.utils.config import DOCS_FOLDER
+from src.utils.config import DOCS_FOLDER, API_RELOAD
 from src.services.retrieval_service import retrieval_pipeline
 from src.utils.pdf_utils import load_pdfs_from_directory
+from src.utils.http_clients import close_http_clients
 import uvicorn
 from loguru import logger
 
-# Create FastAPI app
-app = FastAPI(title="Research Paper Agent API")
+# Create FastAPI app; orjson encodes responses (long snippets included) in C
+app = FastAPI(
+    title="Research Paper Agent API",
+    default_response_class=ORJSONResponse
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -45,6 +50,11 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"Error loading initial documents: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled connections on shutdown"""
+    await close_http_clients()
+
 @app.get("/")
 async def root():
     """Root endpoint to check API status"""
@@ -61,7 +71,13 @@ def run_server():
         "src.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,  # Enable auto-reload during development
+        reload=API_RELOAD,  # Auto-reload re-imports on every file change, keep it to development
+        # uvloop and httptools when installed (uvicorn[standard]), asyncio and h11 otherwise
+        loop="auto",
+        http="auto",
+        # Conversation memory and the vector index live in process memory,
+        # so requests must all reach the same worker
+        workers=1,
         log_level="info"
     )
 
@@ -6,15 +6,19 @@ document-related operations. An `ErrorResponse` model is also included
 to standardize error handling.
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 
 class DocumentReference(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     source: str
     relevance_score: float
     snippet: str
 
 class QueryResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     answer: str
     references: List[DocumentReference]
     thread_id: Optional[str] = None
@@ -6,14 +6,20 @@ It includes the `POST /api/docs/upload` endpoint, which allows users to
  the `GET /api/status` endpoint for checking the status of loaded documents.
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+import uuid
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 from typing import List
 from src.services.retrieval_service import retrieval_pipeline
-from src.utils.pdf_utils import process_uploaded_pdf
+from src.utils.pdf_utils import PARSE_CONCURRENCY, process_uploaded_pdf
 from loguru import logger
 
 router = APIRouter(prefix="/api")
 
+# Distinguishes ETags across restarts, when the pipeline version starts over
+_BOOT_ID = uuid.uuid4().hex[:8]
+
 @router.post("/docs/upload")
 async def upload_documents(files: List[UploadFile] = File(...)):
     """Upload multiple PDF documents to be processed and added to the knowledge base"""
@@ -27,39 +33,56 @@ async def upload_documents(files: List[UploadFile] = File(...)):
         }
         
         all_docs = []
+        pdf_files = []
+        filenames = set()
 
         for file in files:
-            try:
-                if not file.filename.endswith('.pdf'):
-                    results["failed"].append({
-                        "filename": file.filename,
-                        "error": "Only PDF files are supported"
-                    })
-                    continue
+            if not file.filename.endswith('.pdf'):
+                results["failed"].append({
+                    "filename": file.filename,
+                    "error": "Only PDF files are supported"
+                })
+                continue
+            # Files are saved under their names, so a repeated name would be
+            # written by two concurrent parses at once
+            if file.filename in filenames:
+                results["failed"].append({
+                    "filename": file.filename,
+                    "error": "Duplicate filename in this upload"
+                })
+                continue
+            filenames.add(file.filename)
+            pdf_files.append(file)
+
+        # Parse all PDFs concurrently; results come back in upload order
+        parse_semaphore = asyncio.Semaphore(PARSE_CONCURRENCY)
+        processed = await asyncio.gather(
+            *(process_uploaded_pdf(file, parse_semaphore) for file in pdf_files),
+            return_exceptions=True
+        )
 
-                docs = await process_uploaded_pdf(file)
-                if docs:
-                    all_docs.extend(docs)
-                    results["successful"].append({
-                        "filename": file.filename,
-                        "pages": len(docs)
-                    })
-                else:
-                    results["failed"].append({
-                        "filename": file.filename,
-                        "error": "No content could be extracted"
-                    })
-                    
-            except Exception as e:
-                logger.error(f"Error processing file {file.filename}: {e}")
+        for file, docs in zip(pdf_files, processed):
+            if isinstance(docs, Exception):
+                logger.error(f"Error processing file {file.filename}: {docs}")
                 results["failed"].append({
                     "filename": file.filename,
-                    "error": str(e)
+                    "error": str(docs)
+                })
+            elif docs:
+                all_docs.extend(docs)
+                results["successful"].append({
+                    "filename": file.filename,
+                    "pages": len(docs)
+                })
+            else:
+                results["failed"].append({
+                    "filename": file.filename,
+                    "error": "No content could be extracted"
                 })
 
         if all_docs:
-            retrieval_pipeline.rebuild(all_docs)
-            logger.info(f"Rebuilt retrieval pipeline with {len(all_docs)} documents")
+            await retrieval_pipeline.aadd_documents(all_docs)
+            logger.info(f"Added {len(all_docs)} documents to retrieval pipeline")
 
         response = {
             "message": f"Processed {len(results['successful'])} files successfully, {len(results['failed'])} failed",
@@ -78,14 +101,23 @@ async def upload_documents(files: List[UploadFile] = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/status")
-async def get_document_status():
+async def get_document_status(request: Request):
     """Get the status of loaded documents"""
     try:
+        # Status only changes on upload/reset, so pollers can revalidate cheaply
+        etag = f'"{_BOOT_ID}-{retrieval_pipeline.version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
         has_docs = retrieval_pipeline.has_documents()
-        return {
-            "has_documents": has_docs,
-            "document_count": len(retrieval_pipeline.documents) if has_docs else 0
-        }
+        return ORJSONResponse(
+            {
+                "has_documents": has_docs,
+                "document_count": len(retrieval_pipeline.documents) if has_docs else 0
+            },
+            headers=headers
+        )
     except Exception as e:
         logger.exception(f"Error getting document status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,7 +3,8 @@ The `query_router` defines endpoints for query processing, conversation
 thread management, and resetting the vector database.
 The `POST /api/query` endpoint dynamically routes user queries
 to the memory service, vector store, or general LLM handler based on
- the characteristics of the question. It uses `src/services/memory_service.py`
+ the characteristics of the question, and `POST /api/query/stream` returns
+ the same answers streamed as newline-delimited JSON. It uses `src/services/memory_service.py`
   to maintain and manage conversation context. Additionally,
   it includes the `POST /api/thread/reset` endpoint for clearing conversation
   history and the `POST /api/vectordb/reset` endpoint to clear all indexed
@@ -11,20 +12,28 @@ to the memory service, vector store, or general LLM handler based on
 """
 
 from fastapi import APIRouter, Query, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import StrOutputParser
-from pydantic import BaseModel, Field
-from typing import Literal, Optional, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Literal, Optional, List, Tuple
 from src.services.memory_service import memory_service
 from src.services.llm_service import llm_service
 from src.services.graph_service import graph_service
-from src.services.retrieval_service import RetrievalPipeline, retrieval_pipeline
+from src.services.retrieval_service import retrieval_pipeline
+from src.services.answer_cache import AnswerCache
+import asyncio
+import re
 import uuid
+import orjson
+from functools import lru_cache
+from operator import itemgetter
 from loguru import logger
 from langchain.schema import HumanMessage, AIMessage
 from enum import Enum
 from src.services.tracing_service import tracing_service
+from src.utils.http_clients import http_client, async_http_client
 from src.models.request_models import QueryRequest
 from src.models.response_models import QueryResponse, ErrorResponse, DocumentReference
 
@@ -37,6 +46,8 @@ class QueryType(str, Enum):
 
 class RouteQuery(BaseModel):
     """Route a user query to the most appropriate processing method."""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     query_type: Literal["memory", "vectorstore", "general"] = Field(
         ...,
         description="Type of query processing needed"
@@ -48,6 +59,8 @@ class RouteQuery(BaseModel):
 
 class MemoryResponse(BaseModel):
     """Structure the response for memory-related queries."""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     response_type: Literal["count", "list", "history"] = Field(
         ...,
         description="Type of memory response"
@@ -57,11 +70,22 @@ class MemoryResponse(BaseModel):
         description="The formatted response content"
     )
 
+# Tracing handler and per-route invoke configs, built once instead of per request
+_HANDLER = tracing_service.get_handler()
+_ROUTER_CONFIG = {"callbacks": [_HANDLER]}
+_MEMORY_CONFIG = {"callbacks": [_HANDLER], "tags": ["memory", "history", "conversation"]}
+_GENERAL_CONFIG = {"callbacks": [_HANDLER], "tags": ["general", "llm", "direct"]}
+
+# Messages carry their role in `type`, so history rendering needs no isinstance dispatch
+_ROLE_LABELS = {"human": "User"}
+
 # Setup LLM and Chains
 llm = ChatOpenAI(
     model="gpt-4o-mini", 
     temperature=0,
-    callbacks=[tracing_service.get_handler()]
+    http_client=http_client,
+    http_async_client=async_http_client,
+    callbacks=[_HANDLER]
 )
 structured_router = llm.with_structured_output(RouteQuery)
 memory_chain = llm.with_structured_output(MemoryResponse)
@@ -105,25 +129,145 @@ memory_prompt = ChatPromptTemplate.from_messages([
 router_chain = router_prompt | structured_router
 memory_chain = memory_prompt | memory_chain
 
+# Cheap rules that settle obvious routes without an LLM round-trip
+# Memory patterns must name the user or this conversation, so research questions
+# like "How many questions does MMLU contain?" still go to the LLM router. A
+# mention of the conversation or chat only counts at the end of the question,
+# so "this chat model" or "my conversation analysis study" don't match
+_MEMORY_RE = re.compile(
+    r"\b(?:(?:my|our) (?:previous|earlier|last|first) (?:questions?|messages?)"
+    r"|(?:previous|earlier|last|first) (?:questions?|messages?) (?:i|we) (?:asked|sent|wrote)"
+    r"|what (?:did|have) (?:i|we) (?:ask|asked|say|said)"
+    r"|(?:my|our|this) (?:conversation|chat)(?: history)?(?=\s*[?.!]*\s*$)"
+    r"|how many (?:times|messages|questions) (?:have|did) (?:i|we))\b",
+    re.IGNORECASE
+)
+_GENERAL_RE = re.compile(
+    r"^\s*(?:hi|hello|hey|thanks|thank you|who are you|what can you do)\s*[!?.]*\s*$",
+    re.IGNORECASE
+)
+_PREFILTER_TAG = "prefilter_hit"
+
+def prefilter_route(question: str) -> Optional[RouteQuery]:
+    """Route obvious memory/general questions by pattern, or return None to defer to the LLM router"""
+    if _MEMORY_RE.search(question):
+        return RouteQuery(query_type="memory", reason="Matched conversation history pattern")
+    if _GENERAL_RE.match(question):
+        return RouteQuery(query_type="general", reason="Matched greeting/capability pattern")
+    return None
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_question(question: str) -> str:
+    """Lowercase and collapse whitespace so near-identical questions share a cache entry"""
+    return _WHITESPACE_RE.sub(" ", question.strip().lower())
+
+@lru_cache(maxsize=2048)
+def _cached_route(normalized_question: str) -> Tuple[str, str]:
+    """LLM routing decision for a normalized question, as an immutable (query_type, reason) pair"""
+    route = router_chain.invoke(
+        {"question": normalized_question},
+        config=_ROUTER_CONFIG
+    )
+    return route.query_type, route.reason
+
+def llm_route(question: str, use_cache: bool = True) -> RouteQuery:
+    """Route a question with the LLM router, reusing earlier decisions when allowed"""
+    if not use_cache:
+        return router_chain.invoke({"question": question}, config=_ROUTER_CONFIG)
+    query_type, reason = _cached_route(normalize_question(question))
+    # Values came from an already validated RouteQuery, skip re-validation
+    return RouteQuery.model_construct(query_type=query_type, reason=reason)
+
+# Research answers keyed on (normalized question, corpus version); they don't
+# depend on thread history, and the version key drops them after uploads/resets
+_ANSWER_CACHE = AnswerCache(maxsize=1024, ttl=60)
+
+def retrieval_evidence(retrieved_docs: List[dict]) -> frozenset:
+    """The chunks a question retrieved, which a paraphrase must share to reuse its answer"""
+    return frozenset((doc["source"], hash(doc["content"])) for doc in retrieved_docs)
+
+def similar_research_answer(query_vector: List[float], evidence: frozenset) -> Optional[tuple]:
+    """Cached (answer, references) for a close paraphrase of this question that retrieved the same chunks"""
+    return _ANSWER_CACHE.get_similar(query_vector, retrieval_pipeline.version, evidence)
+
+def cache_research_answer(cache_key: tuple, query_vector: List[float], evidence: frozenset,
+                          answer: str, references: list):
+    """Cache a research answer under its question, question embedding and retrieved chunks"""
+    _ANSWER_CACHE.set(
+        cache_key,
+        (answer, references),
+        vector=query_vector,
+        version=cache_key[1],
+        evidence=evidence
+    )
+
+def serve_cached_answer(question: str, thread_id: str, cached: tuple) -> QueryResponse:
+    """Answer from the answer cache, remembering the exchange like a generated answer"""
+    answer, references = cached
+    logger.info("Serving research answer from cache")
+    memory_service.add_messages(thread_id, [
+        HumanMessage(content=question),
+        AIMessage(content=answer)
+    ])
+    return QueryResponse(
+        answer=answer,
+        references=references,
+        thread_id=thread_id
+    )
+
+SNIPPET_MAX_CHARS = 500
+SNIPPET_MAX_BYTES = 1000
+
+def make_snippet(content: str) -> str:
+    """First SNIPPET_MAX_CHARS characters of a document, capped at SNIPPET_MAX_BYTES of UTF-8"""
+    snippet = content[:SNIPPET_MAX_CHARS]
+    if snippet.isascii():
+        return snippet
+    # Wide characters: trim on a UTF-8 boundary so snippets can't balloon the response
+    return snippet.encode("utf-8")[:SNIPPET_MAX_BYTES].decode("utf-8", "ignore")
+
+def route_question(request: QueryRequest) -> Tuple[RouteQuery, bool]:
+    """Route a request, trying the rules prefilter before the LLM router; also reports whether the prefilter matched"""
+    route = prefilter_route(request.question)
+    prefiltered = route is not None
+    if not prefiltered:
+        # A per-request config may change routing, so don't serve it from the cache
+        route = llm_route(request.question, use_cache=not request.config)
+    
+    logger.info(f"Question routed to: {route.query_type} (prefilter: {prefiltered})")
+    return route, prefiltered
+
+def build_references(relevant_docs: Optional[List[dict]]) -> List[DocumentReference]:
+    """Format references from graded documents, sorting the raw dicts so references are built once, already in order"""
+    if not relevant_docs:
+        return []
+    return [
+        DocumentReference(
+            source=doc["source"].split('/')[-1],
+            relevance_score=doc["grade"],
+            snippet=make_snippet(doc["content"])
+        )
+        for doc in sorted(relevant_docs, key=itemgetter("grade"), reverse=True)
+    ]
+
 def handle_memory_question(question: str, thread_id: str, tags: Optional[List[str]] = None) -> dict:
     """Handle questions about conversation history"""
     messages = memory_service.get_messages(thread_id)
-    history = "\n".join([f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}" 
-                        for m in messages])
+    history = "\n".join(f"{_ROLE_LABELS.get(m.type, 'Assistant')}: {m.content}" for m in messages)
 
     memory_result = memory_chain.invoke(
         {
             "question": question,
             "history": history
         },
-        config={
-            "callbacks": [tracing_service.get_handler()],
-            "tags": tags or ["memory", "history", "conversation"]
-        }
+        config={**_MEMORY_CONFIG, "tags": tags} if tags else _MEMORY_CONFIG
     )
 
-    memory_service.add_message(thread_id, HumanMessage(content=question))
-    memory_service.add_message(thread_id, AIMessage(content=memory_result.content))
+    memory_service.add_messages(thread_id, [
+        HumanMessage(content=question),
+        AIMessage(content=memory_result.content)
+    ])
     
     return {
         "response": memory_result.content,
@@ -136,13 +280,12 @@ def handle_general_question(question: str, thread_id: str, tags: Optional[List[s
     """Handle general questions using LLM"""
     response = llm_service.invoke(
         question,
-        config={
-            "callbacks": [tracing_service.get_handler()],
-            "tags": tags or ["general", "llm", "direct"]
-        }
+        config={**_GENERAL_CONFIG, "tags": tags} if tags else _GENERAL_CONFIG
     )
-    memory_service.add_message(thread_id, HumanMessage(content=question))
-    memory_service.add_message(thread_id, AIMessage(content=response))
+    memory_service.add_messages(thread_id, [
+        HumanMessage(content=question),
+        AIMessage(content=response)
+    ])
     
     return {
         "response": response,
@@ -155,110 +298,233 @@ async def query(request: QueryRequest):
     """Process a query with document references"""
     try:
         thread_id = request.thread_id or str(uuid.uuid4())
+        route, prefiltered = route_question(request)
+        return await answer_query(request, thread_id, route, prefiltered)
         
-        # Route the question
-        route = router_chain.invoke(
-            {"question": request.question},
-            config={"callbacks": [tracing_service.get_handler()]}
+    except Exception as e:
+        logger.exception(f"Error processing query: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def answer_query(request: QueryRequest, thread_id: str, route: RouteQuery, prefiltered: bool) -> QueryResponse:
+    """Answer a query that has already been routed"""
+    if route.query_type == "memory":
+        result = handle_memory_question(
+            request.question,
+            thread_id,
+            tags=_MEMORY_CONFIG["tags"] + [_PREFILTER_TAG] if prefiltered else None
+        )
+        return QueryResponse(
+            answer=result["response"],
+            references=[],
+            thread_id=thread_id
         )
         
-        logger.info(f"Question routed to: {route.query_type}")
+    elif route.query_type == "general":
+        result = handle_general_question(
+            request.question,
+            thread_id,
+            tags=_GENERAL_CONFIG["tags"] + [_PREFILTER_TAG] if prefiltered else None
+        )
+        return QueryResponse(
+            answer=result["response"],
+            references=[],
+            thread_id=thread_id
+        )
         
-        if route.query_type == "memory":
-            result = handle_memory_question(request.question, thread_id)
+    elif route.query_type == "vectorstore":
+        if not retrieval_pipeline.has_documents():
             return QueryResponse(
-                answer=result["response"],
+                answer="I cannot answer research questions as no documents have been loaded. Please upload some research papers first.",
                 references=[],
                 thread_id=thread_id
             )
             
-        elif route.query_type == "general":
-            result = handle_general_question(request.question, thread_id)
-            return QueryResponse(
-                answer=result["response"],
-                references=[],
-                thread_id=thread_id
-            )
+        # Embedded once here and reused by the answer cache and retrieval
+        query_vector = retrieval_pipeline.embed_query(request.question)
+        
+        # Serve repeated research questions from the short-lived answer cache
+        cache_key = (normalize_question(request.question), retrieval_pipeline.version)
+        cached = None if request.config else _ANSWER_CACHE.get(cache_key)
+        if cached is not None:
+            return serve_cached_answer(request.question, thread_id, cached)
             
-        elif route.query_type == "vectorstore":
-            if not retrieval_pipeline.has_documents():
+        try:
+            # Initialize graph state
+            state = {
+                "question": request.question,
+                "documents": [],
+                "rewritten_question": None,
+                "graded_docs": None,
+                "answer": None,
+                "thread_id": thread_id
+            }
+            
+            # Get initial documents
+            retrieved_docs = retrieval_pipeline.retrieve(request.question, query_vector=query_vector)
+            if not retrieved_docs:
                 return QueryResponse(
-                    answer="I cannot answer research questions as no documents have been loaded. Please upload some research papers first.",
+                    answer="I couldn't find any relevant information in the documents.",
                     references=[],
                     thread_id=thread_id
                 )
-                
+            
+            evidence = retrieval_evidence(retrieved_docs)
+            cached = None if request.config else similar_research_answer(query_vector, evidence)
+            if cached is not None:
+                return serve_cached_answer(request.question, thread_id, cached)
+            
+            # Add retrieved docs to state
+            state["documents"] = [
+                {
+                    "content": doc["content"],
+                    "source": doc["source"],
+                    "score": doc["score"]
+                } for doc in retrieved_docs
+            ]
+            
+            # Process through graph service
             try:
-                # Initialize graph state
-                state = {
-                    "question": request.question,
-                    "documents": [],
-                    "rewritten_question": None,
-                    "graded_docs": None,
-                    "answer": None,
-                    "thread_id": thread_id
-                }
+                graph_result = await graph_service.aprocess_state(state)
+                
+                references = build_references(graph_result.get("relevant_docs"))
                 
-                # Get initial documents
-                retrieved_docs = retrieval_pipeline.retrieve(request.question)
-                if not retrieved_docs:
-                    return QueryResponse(
-                        answer="I couldn't find any relevant information in the documents.",
-                        references=[],
-                        thread_id=thread_id
-                    )
+                # Get final answer
+                answer = graph_result.get("answer", "Could not generate an answer from the documents.")
                 
-                # Add retrieved docs to state
-                state["documents"] = [
-                    {
-                        "content": doc["content"],
-                        "source": doc["source"],
-                        "score": doc["score"]
-                    } for doc in retrieved_docs
-                ]
+                cache_research_answer(cache_key, query_vector, evidence, answer, references)
                 
-                # Process through graph service
-                try:
-                    graph_result = graph_service.process_state(state)
-                    
-                    # Format references from graded documents
-                    references = []
-                    if graph_result.get("relevant_docs"):
-                        references = [
-                            DocumentReference(
-                                source=doc["source"].split('/')[-1],
-                                relevance_score=doc["grade"],
-                                snippet=doc["content"][:500]
-                            )
-                            for doc in graph_result["relevant_docs"]
-                        ]
-                    
-                    # Get final answer
-                    answer = graph_result.get("answer", "Could not generate an answer from the documents.")
-                    
-                    # Add to conversation history
-                    memory_service.add_message(thread_id, HumanMessage(content=request.question))
-                    memory_service.add_message(thread_id, AIMessage(content=answer))
-                    
-                    return QueryResponse(
-                        answer=answer,
-                        references=sorted(references, key=lambda x: x.relevance_score, reverse=True),
-                        thread_id=thread_id
-                    )
-                    
-                except Exception as graph_error:
-                    logger.error(f"Graph processing error: {graph_error}")
-                    # Fallback to simpler processing
-                    return handle_research_fallback(request.question, retrieved_docs, thread_id)
+                # Add to conversation history
+                memory_service.add_messages(thread_id, [
+                    HumanMessage(content=request.question),
+                    AIMessage(content=answer)
+                ])
+                
+                return QueryResponse(
+                    answer=answer,
+                    references=references,
+                    thread_id=thread_id
+                )
                 
-            except Exception as e:
-                logger.error(f"Error processing research question: {e}")
-                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as graph_error:
+                logger.error(f"Graph processing error: {graph_error}")
+                # Fallback to simpler processing
+                return handle_research_fallback(request.question, retrieved_docs, thread_id)
+            
+        except Exception as e:
+            logger.error(f"Error processing research question: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+def _ndjson(event: dict) -> bytes:
+    """Encode one event of a streamed response as a line of JSON"""
+    return orjson.dumps(event) + b"\n"
+
+async def _stream_answer(answer: str, references: List[DocumentReference], thread_id: str):
+    """Stream an answer that is already complete"""
+    yield _ndjson({
+        "thread_id": thread_id,
+        "references": [reference.model_dump() for reference in references]
+    })
+    yield _ndjson({"token": answer})
+
+async def _stream_research_answer(state: dict, question: str, cache_key: tuple, query_vector: List[float],
+                                  evidence: frozenset):
+    """Stream a research answer as the LLM generates it, then cache and remember it"""
+    references = build_references(state["relevant_docs"])
+    yield _ndjson({
+        "thread_id": state["thread_id"],
+        "references": [reference.model_dump() for reference in references]
+    })
+    try:
+        async for chunk in graph_service.astream_answer(state):
+            yield _ndjson({"token": chunk})
+    except Exception as e:
+        # Headers are already sent, so report the failure in the stream itself
+        logger.error(f"Error streaming research answer: {e}")
+        yield _ndjson({"error": str(e)})
+        return
+    
+    answer = state["answer"]
+    cache_research_answer(cache_key, query_vector, evidence, answer, references)
+    memory_service.add_messages(state["thread_id"], [
+        HumanMessage(content=question),
+        AIMessage(content=answer)
+    ])
+
+@router.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """Process a query, streaming the answer as newline-delimited JSON"""
+    # The first line carries the thread id and references, each following line a
+    # piece of the answer. If the client disconnects, the stream is cancelled and
+    # so is the LLM request behind it
+    try:
+        thread_id = request.thread_id or str(uuid.uuid4())
+        route, prefiltered = route_question(request)
+        
+        # Rule out the cases that never reach the graph before embedding the
+        # question for the cache lookup and retrieval
+        streamable = route.query_type == "vectorstore" and retrieval_pipeline.has_documents()
+        if streamable:
+            query_vector = retrieval_pipeline.embed_query(request.question)
+            cache_key = (normalize_question(request.question), retrieval_pipeline.version)
+            cached = None if request.config else _ANSWER_CACHE.get(cache_key)
+        if not streamable or cached is not None:
+            # Answers that aren't generated from documents are short, send them whole
+            response = await answer_query(request, thread_id, route, prefiltered)
+            return StreamingResponse(
+                _stream_answer(response.answer, response.references, thread_id),
+                media_type="application/x-ndjson"
+            )
+        
+        retrieved_docs = retrieval_pipeline.retrieve(request.question, query_vector=query_vector)
+        if not retrieved_docs:
+            return StreamingResponse(
+                _stream_answer("I couldn't find any relevant information in the documents.", [], thread_id),
+                media_type="application/x-ndjson"
+            )
         
+        evidence = retrieval_evidence(retrieved_docs)
+        cached = None if request.config else similar_research_answer(query_vector, evidence)
+        if cached is not None:
+            response = serve_cached_answer(request.question, thread_id, cached)
+            return StreamingResponse(
+                _stream_answer(response.answer, response.references, thread_id),
+                media_type="application/x-ndjson"
+            )
+        
+        state = {
+            "question": request.question,
+            "documents": [
+                {
+                    "content": doc["content"],
+                    "source": doc["source"],
+                    "score": doc["score"]
+                } for doc in retrieved_docs
+            ],
+            "rewritten_question": None,
+            "graded_docs": None,
+            "answer": None,
+            "thread_id": thread_id
+        }
+        state = await graph_service.aprepare_state(state)
+        state["relevant_docs"] = graph_service.select_relevant_docs(state)
+        
+        return StreamingResponse(
+            _stream_research_answer(state, request.question, cache_key, query_vector, evidence),
+            media_type="application/x-ndjson"
+        )
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.exception(f"Error processing query: {e}")
+        logger.exception(f"Error processing streamed query: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+FALLBACK_TMPL = """Context from papers:
+{context}
+
+Question: Based ONLY on the provided research papers, answer the following question: {question}
+Please provide a clear and concise answer, focusing on key findings and conclusions."""
+
 def handle_research_fallback(question: str, docs: List[dict], thread_id: str) -> QueryResponse:
     """Fallback handler for research questions when graph processing fails"""
     try:
@@ -267,11 +533,8 @@ def handle_research_fallback(question: str, docs: List[dict], thread_id: str) ->
             for doc in docs
         ])
         
-        focused_question = f"""Based ONLY on the provided research papers, answer the following question: {question}
-        Please provide a clear and concise answer, focusing on key findings and conclusions."""
-        
         answer = llm_service.invoke(
-            f"Context from papers:\n{context}\n\nQuestion: {focused_question}",
+            FALLBACK_TMPL.format(context=context, question=question),
             config={"temperature": 0.2}
         )
         
@@ -279,13 +542,15 @@ def handle_research_fallback(question: str, docs: List[dict], thread_id: str) ->
             DocumentReference(
                 source=doc['source'].split('/')[-1],
                 relevance_score=doc['score'],
-                snippet=doc['content'][:500]
+                snippet=make_snippet(doc['content'])
             )
             for doc in docs
         ]
         
-        memory_service.add_message(thread_id, HumanMessage(content=question))
-        memory_service.add_message(thread_id, AIMessage(content=answer))
+        memory_service.add_messages(thread_id, [
+            HumanMessage(content=question),
+            AIMessage(content=answer)
+        ])
         
         return QueryResponse(
             answer=answer,
@@ -324,8 +589,9 @@ async def reset_thread(thread_id: str = Query(..., description="Thread ID to res
 async def reset_vectordb():
     """Reset the vector database"""
     try:
-        # Reset the existing pipeline instead of creating new one
-        retrieval_pipeline.reset()
+        # Reset the existing pipeline instead of creating new one. It waits for
+        # any upload still indexing, so that runs off the event loop
+        await asyncio.to_thread(retrieval_pipeline.reset)
         
         logger.info("Vector database reset successfully")
         return {
@@ -0,0 +1,62 @@
+"""
+The `answer_cache` module provides a short-lived cache for research answers.
+Answers are looked up by normalized question first and, failing that, by
+question embedding, so a close paraphrase of a recently answered question
+reuses its answer without grading or generation. Embeddings of related but
+different questions can be nearly as close as paraphrases, so a similar
+question's answer is only reused if it was drawn from the same chunks.
+"""
+
+from threading import Lock
+from typing import Any, FrozenSet, Hashable, List, Optional
+
+import numpy as np
+from cachetools import TTLCache
+from loguru import logger
+
+# Minimum cosine similarity between question embeddings to reuse an answer
+SIMILARITY_THRESHOLD = 0.97
+
+def _unit(vector: List[float]) -> np.ndarray:
+    """Vector as float32 scaled to unit length"""
+    array = np.asarray(vector, dtype=np.float32)
+    return array / max(float(np.linalg.norm(array)), 1e-12)
+
+class AnswerCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._answers: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Same keys as _answers, holding (corpus version, retrieved chunks, unit question embedding)
+        self._vectors: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the answer cached under exactly this key"""
+        with self._lock:
+            return self._answers.get(key)
+
+    def get_similar(self, vector: List[float], version: int, evidence: FrozenSet) -> Optional[Any]:
+        """Return the answer to the most similar cached question that retrieved the same chunks, if similar enough"""
+        with self._lock:
+            candidates = [
+                (key, question_vector)
+                for key, (entry_version, entry_evidence, question_vector) in self._vectors.items()
+                if entry_version == version and entry_evidence == evidence
+            ]
+        if not candidates:
+            return None
+
+        similarities = np.stack([question_vector for _, question_vector in candidates]) @ _unit(vector)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        logger.info(f"Semantic answer cache hit (similarity {similarities[best]:.3f})")
+        return self.get(candidates[best][0])
+
+    def set(self, key: Hashable, answer: Any, vector: Optional[List[float]] = None, version: Optional[int] = None,
+            evidence: Optional[FrozenSet] = None):
+        """Cache an answer, and its question embedding and retrieved chunks for similarity lookups when given"""
+        with self._lock:
+            self._answers[key] = answer
+            if vector is not None and evidence is not None:
+                self._vectors[key] = (version, evidence, _unit(vector))
@@ -7,14 +7,97 @@ rewriting, document grading, and answer generation. It leverages
 ensuring a seamless question-answering pipeline.
 """
 
-from typing import Dict, Any, List
+import asyncio
+import json
+import re
+from typing import AsyncIterator, Dict, Any, List, Optional
 from loguru import logger
 from langchain.schema import HumanMessage, AIMessage
 from src.services.llm_service import llm_service
 
+# Grading replies may wrap the JSON in prose or code fences
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Cap on concurrent per-document grading calls, to stay under provider rate limits
+MAX_CONCURRENT_GRADES = 8
+
+# Retrieval scores outside this band are confident enough to use as grades
+# directly; only documents inside it are sent to the LLM grader
+CONFIDENT_LOW = 0.2
+CONFIDENT_HIGH = 0.8
+
+def needs_llm_grade(doc: Dict[str, Any]) -> bool:
+    """Whether a document's retrieval score is too ambiguous to use as its grade"""
+    return CONFIDENT_LOW <= doc["score"] <= CONFIDENT_HIGH
+
+# Sampling settings for the final answer, shared by the blocking and streaming paths
+ANSWER_CONFIG = {"temperature": 0.2, "max_tokens": 1000}
+
+# Prompt templates are built once and sent without indentation, which would
+# otherwise cost input tokens on every call
+REWRITE_TMPL = """Rewrite this research question to be more specific and focused: "{question}"
+
+Rules:
+1. Keep it concise
+2. Use technical terminology
+3. Focus on specific aspects
+4. Maintain clarity
+
+Return ONLY the rewritten question, nothing else."""
+
+ANSWER_TMPL = """Based on these research paper excerpts, answer this question: "{question}"
+
+Context from papers:
+{context}
+
+Instructions:
+1. Only use information from the provided excerpts
+2. Cite specific papers when making claims
+3. If information is incomplete or unclear, acknowledge it
+4. Focus on key findings and conclusions
+5. Be concise but thorough
+6. Include clear references to papers
+
+Answer:"""
+
+# Grading prompts open with their fixed instructions and put the question
+# before the documents, so every grading call for a request shares the same
+# prefix and providers with prompt caching can reuse it
+BATCH_GRADE_INSTRUCTIONS = """Rate the relevance of each document excerpt to the question.
+
+Rate each excerpt from 0-1 where:
+0: Not relevant at all
+0.5: Somewhat relevant
+1: Highly relevant
+
+Return ONLY a JSON object with one score per excerpt, in order, e.g. {"scores": [0.7, 0.2]}."""
+
+GRADE_INSTRUCTIONS = """Rate the relevance of the document excerpt to the question.
+
+Output one digit from 0-4 where:
+0: Not relevant at all
+2: Somewhat relevant
+4: Highly relevant
+
+Return ONLY the digit."""
+
+# Per-document grades are a single digit, so one output token is enough.
+# logit_bias nudges OpenAI models toward the tokens for '0'-'4' (ids 15-19);
+# LLMService only sends it to the OpenAI backup
+GRADE_CONFIG = {
+    "temperature": 0,
+    "max_tokens": 1,
+    "logit_bias": {token_id: 5 for token_id in range(15, 20)}
+}
+GRADE_LEVELS = 4
+
 class GraphService:
-    def __init__(self, recursion_limit: int = 15):
+    def __init__(self, recursion_limit: int = 15, batch_grading: bool = False):
         self.recursion_limit = recursion_limit
+        # The async path grades each document with its own concurrent call that
+        # returns a single digit token; when True, it sends all documents in one
+        # prompt as the sync path does
+        self.batch_grading = batch_grading
         logger.info(f"Initializing GraphService with recursion limit: {recursion_limit}")
 
     def process_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
@@ -35,18 +118,26 @@ class GraphService:
             logger.error(f"Error in graph processing: {e}")
             raise
 
+    async def aprocess_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Process the state through the graph workflow without blocking the event loop"""
+        try:
+            state = await self.aprepare_state(state)
+            state = await asyncio.to_thread(self.generate_answer, state)
+            return state
+            
+        except Exception as e:
+            logger.error(f"Error in graph processing: {e}")
+            raise
+
+    async def aprepare_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the steps before answer generation: rewrite the question and grade the documents"""
+        state = await asyncio.to_thread(self.rewrite_question, state)
+        return await self.agrade_documents(state)
+
     def rewrite_question(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Improve the question for better document retrieval"""
         try:
-            prompt = f"""Rewrite this research question to be more specific and focused: "{state['question']}"
-            
-            Rules:
-            1. Keep it concise
-            2. Use technical terminology
-            3. Focus on specific aspects
-            4. Maintain clarity
-            
-            Return ONLY the rewritten question, nothing else."""
+            prompt = REWRITE_TMPL.format(question=state['question'])
             
             rewritten = llm_service.invoke(prompt, config={"temperature": 0.3})
             # Clean up the response - remove quotes and extra whitespace
@@ -66,32 +157,31 @@ class GraphService:
         try:
             graded_docs = []
             question = state["rewritten_question"] or state["question"]
+            documents = state["documents"]
             
-            for doc in state["documents"]:
-                grade_prompt = f"""Rate the relevance of this document excerpt to the question: "{question}"
-
-                Document content:
-                {doc['content'][:1000]}...
-
-                Rate from 0-1 where:
-                0: Not relevant at all
-                0.5: Somewhat relevant
-                1: Highly relevant
-
-                Return ONLY the numerical score (e.g., 0.7)."""
-                
+            # Confidently scored documents keep their retrieval score as grade
+            to_grade = [doc for doc in documents if needs_llm_grade(doc)]
+            logger.info(f"Grading {len(to_grade)} of {len(documents)} documents with the LLM")
+            
+            # Grade every excerpt in one call instead of one round-trip per document
+            llm_grades = {}
+            if to_grade:
+                excerpts = "\n\n".join(
+                    f"[{i}] {doc['content'][:1000]}..."
+                    for i, doc in enumerate(to_grade)
+                )
+                grade_prompt = f"{BATCH_GRADE_INSTRUCTIONS}\n\nQUESTION:\n{question}\n\nDOCUMENTS:\n{excerpts}"
                 response = llm_service.invoke(grade_prompt, config={"temperature": 0.1})
-                
-                try:
-                    # Clean up and extract numerical score
-                    grade = float(response.strip())
-                except:
-                    grade = doc['score']
-                
+                scores = self._parse_scores(response, len(to_grade))
+                llm_grades = {id(doc): score for doc, score in zip(to_grade, scores)}
+            
+            for doc in documents:
+                score = llm_grades.get(id(doc))
                 graded_docs.append({
                     "content": doc["content"],
                     "source": doc["source"],
-                    "grade": grade,
+                    # Retrieval score when the document wasn't sent or the model skipped it
+                    "grade": score if score is not None else doc["score"],
                     "original_score": doc["score"]
                 })
             
@@ -109,44 +199,104 @@ class GraphService:
             } for doc in state["documents"]]
             return state
 
-    def generate_answer(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate final answer using graded documents"""
+    async def agrade_documents(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Grade documents for relevance, one concurrent LLM call per document"""
+        if self.batch_grading:
+            return await asyncio.to_thread(self.grade_documents, state)
+
         try:
-            # Use only highly relevant documents
-            relevant_docs = [
-                doc for doc in state["graded_docs"]
-                if doc["grade"] > 0.5
-            ]
-            
-            if not relevant_docs:
-                relevant_docs = state["graded_docs"][:2]  # Use top 2 if none are highly relevant
-            
-            context = "\n\n".join([
-                f"From {doc['source']} (relevance: {doc['grade']:.2f}):\n{doc['content']}"
-                for doc in relevant_docs
-            ])
-            
-            prompt = f"""Based on these research paper excerpts, answer this question: "{state['question']}"
+            question = state["rewritten_question"] or state["question"]
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_GRADES)
+            # Shared by every call below; only the document part differs
+            prompt_prefix = f"{GRADE_INSTRUCTIONS}\n\nQUESTION:\n{question}\n\nDOCUMENT:\n"
 
-            Context from papers:
-            {context}
+            async def grade_one(doc: Dict[str, Any]) -> Dict[str, Any]:
+                grade = doc["score"]
+                if needs_llm_grade(doc):
+                    grade_prompt = f"{prompt_prefix}{doc['content'][:1000]}..."
+                    async with semaphore:
+                        response = await llm_service.ainvoke(grade_prompt, config=GRADE_CONFIG)
+                    digit = response.strip()
+                    if len(digit) == 1 and "0" <= digit <= "4":
+                        grade = int(digit) / GRADE_LEVELS
+                    else:
+                        logger.warning(f"Unexpected grade {response!r}, using retrieval score")
+                return {
+                    "content": doc["content"],
+                    "source": doc["source"],
+                    "grade": grade,
+                    "original_score": doc["score"]
+                }
 
-            Instructions:
-            1. Only use information from the provided excerpts
-            2. Cite specific papers when making claims
-            3. If information is incomplete or unclear, acknowledge it
-            4. Focus on key findings and conclusions
-            5. Be concise but thorough
-            6. Include clear references to papers
+            graded_docs = list(await asyncio.gather(*(grade_one(doc) for doc in state["documents"])))
+            graded_docs.sort(key=lambda x: x["grade"], reverse=True)
+            state["graded_docs"] = graded_docs
+            return state
 
-            Answer:"""
+        except Exception as e:
+            logger.error(f"Error grading documents: {e}")
+            state["graded_docs"] = [{
+                **doc,
+                "grade": doc["score"]
+            } for doc in state["documents"]]
+            return state
+
+    @staticmethod
+    def _parse_scores(response: str, count: int) -> List[Optional[float]]:
+        """Parse a {"scores": [...]} reply into `count` scores, None where unusable"""
+        scores: List[Optional[float]] = [None] * count
+        match = _JSON_OBJECT_RE.search(response)
+        if not match:
+            logger.warning("Batch grading reply had no JSON object, using retrieval scores")
+            return scores
+        try:
+            raw_scores = json.loads(match.group(0)).get("scores", [])
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning(f"Could not parse batch grading reply: {e}")
+            return scores
+        if not isinstance(raw_scores, list):
+            logger.warning("Batch grading reply had no list of scores, using retrieval scores")
+            return scores
+        for i, raw in enumerate(raw_scores[:count]):
+            try:
+                score = float(raw)
+            except (TypeError, ValueError):
+                continue
+            # Out-of-range (or NaN) scores are as unusable as missing ones
+            if 0.0 <= score <= 1.0:
+                scores[i] = score
+        return scores
+
+    def select_relevant_docs(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Pick the graded documents the answer is generated from"""
+        # Use only highly relevant documents
+        relevant_docs = [
+            doc for doc in state["graded_docs"]
+            if doc["grade"] > 0.5
+        ]
+        
+        if not relevant_docs:
+            relevant_docs = state["graded_docs"][:2]  # Use top 2 if none are highly relevant
+        
+        return relevant_docs
+
+    def _answer_prompt(self, question: str, relevant_docs: List[Dict[str, Any]]) -> str:
+        """Build the answer generation prompt from the selected documents"""
+        context = "\n\n".join([
+            f"From {doc['source']} (relevance: {doc['grade']:.2f}):\n{doc['content']}"
+            for doc in relevant_docs
+        ])
+        
+        return ANSWER_TMPL.format(question=question, context=context)
+
+    def generate_answer(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate final answer using graded documents"""
+        try:
+            relevant_docs = self.select_relevant_docs(state)
             
             answer = llm_service.invoke(
-                prompt,
-                config={
-                    "temperature": 0.2,
-                    "max_tokens": 1000
-                }
+                self._answer_prompt(state["question"], relevant_docs),
+                config=ANSWER_CONFIG
             )
             
             # Store both answer and relevant docs in state
@@ -158,4 +308,23 @@ class GraphService:
             logger.error(f"Error generating answer: {e}")
             raise
 
+    async def astream_answer(self, state: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream the final answer as it is generated, storing the full text in the state at the end"""
+        if state.get("relevant_docs") is None:
+            state["relevant_docs"] = self.select_relevant_docs(state)
+        
+        chunks = []
+        try:
+            async for chunk in llm_service.astream(
+                self._answer_prompt(state["question"], state["relevant_docs"]),
+                config=ANSWER_CONFIG
+            ):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error generating answer: {e}")
+            raise
+        
+        state["answer"] = "".join(chunks)
+
 graph_service = GraphService()
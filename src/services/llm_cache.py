@@ -0,0 +1,58 @@
+"""
+The `llm_cache` module provides an in-memory LRU cache for LLM responses.
+Entries are keyed on a SHA-256 digest of the model, the generation
+settings and the prompt, so repeating an identical prompt (for example
+rewriting a question asked before, or grading the same excerpts again)
+is answered without another API call.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from loguru import logger
+
+class LLMCache:
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, str]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature=None, max_tokens=None, **params) -> bytes:
+        """Digest of everything that determines the response; `params` are any other request parameters"""
+        # Sorted so equal parameter dicts (e.g. logit_bias) give equal keys whatever their order
+        extra = json.dumps(params, sort_keys=True) if params else ""
+        raw = "\0".join((model, str(temperature), str(max_tokens), extra, prompt))
+        return hashlib.sha256(raw.encode("utf-8")).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Return a cached response, marking it most recently used"""
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        logger.debug(f"LLM cache hit ({self.hits} hits / {self.misses} misses)")
+        return response
+
+    def set(self, key: bytes, response: str):
+        """Store a response, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+
+llm_cache = LLMCache()
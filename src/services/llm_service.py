@@ -11,8 +11,20 @@ from langchain_together import ChatTogether
 from langchain.schema import SystemMessage
 from src.utils.config import OPENAI_API_KEY, TOGETHER_API_KEY
 from src.services.tracing_service import tracing_service
+from src.services.llm_cache import llm_cache
+from src.utils.http_clients import http_client, async_http_client
 from loguru import logger
-from typing import Optional, Dict
+from typing import AsyncIterator, Optional, Dict, Tuple
+import time
+
+# How long to keep using the backup LLM after the primary fails a request
+PRIMARY_RETRY_SECONDS = 60
+
+# Config keys that are sampling parameters for the model request. LangChain
+# ignores them in a run config, so they are passed to the model call instead
+MODEL_PARAM_KEYS = frozenset({"temperature", "max_tokens", "logit_bias"})
+# Token ids are tokenizer specific, so these only go to the OpenAI backup model
+OPENAI_ONLY_PARAM_KEYS = frozenset({"logit_bias"})
 
 class LLMService:
     def __init__(self, model="meta-llama/Llama-3.3-70B-Instruct-Turbo", temperature=0):
@@ -21,6 +33,9 @@ class LLMService:
         self.temperature = temperature
         self._primary_llm = None
         self._backup_llm = None
+        # Primary health is learned from real requests, not test calls
+        self._primary_healthy = True
+        self._last_check = 0.0
         self.system_prompt = """You are a Research Paper Agent, build for research paper chatbot.
 Always maintain a professional, academic tone while being helpful and clear."""
         
@@ -35,6 +50,8 @@ Always maintain a professional, academic tone while being helpful and clear."""
                 temperature=self.temperature,
                 api_key=TOGETHER_API_KEY,
                 max_retries=2,
+                http_client=http_client,
+                http_async_client=async_http_client,
                 callbacks=[tracing_service.get_handler()]
             )
             logger.info(f"Initialized primary LLM with model: {self.primary_model}")
@@ -48,6 +65,8 @@ Always maintain a professional, academic tone while being helpful and clear."""
                 model=self.backup_model,
                 temperature=self.temperature,
                 api_key=OPENAI_API_KEY,
+                http_client=http_client,
+                http_async_client=async_http_client,
                 callbacks=[tracing_service.get_handler()]
             )
             logger.info(f"Initialized backup LLM with model: {self.backup_model}")
@@ -61,14 +80,12 @@ Always maintain a professional, academic tone while being helpful and clear."""
         if not self._primary_llm and not self._backup_llm:
             self.setup_llm()
         
-        # Try primary LLM first
-        if self._primary_llm:
-            try:
-                # Quick test to check if primary LLM is responsive
-                self._primary_llm.invoke([{"role": "user", "content": "test"}])
-                return self._primary_llm
-            except Exception as e:
-                logger.warning(f"Primary LLM failed, falling back to backup: {e}")
+        # Try primary LLM first, giving it another chance once the retry window has passed
+        if self._primary_llm and (
+            self._primary_healthy
+            or time.monotonic() - self._last_check >= PRIMARY_RETRY_SECONDS
+        ):
+            return self._primary_llm
         
         # Fallback to backup LLM
         if self._backup_llm:
@@ -76,15 +93,55 @@ Always maintain a professional, academic tone while being helpful and clear."""
         
         raise RuntimeError("No LLM service available")
     
+    def _mark_primary_failed(self, error: Exception):
+        """Route calls to the backup LLM until the retry window passes"""
+        logger.warning(f"Primary LLM failed, falling back to backup: {error}")
+        self._primary_healthy = False
+        self._last_check = time.monotonic()
+
+    def _build_messages(self, prompt: str) -> list:
+        """Wrap a prompt with the system prompt"""
+        return [
+            SystemMessage(content=self.system_prompt),
+            {"role": "user", "content": prompt}
+        ]
+
+    def _model_name(self, current_llm) -> str:
+        """Name of the model behind an LLM instance"""
+        return self.primary_model if current_llm == self._primary_llm else self.backup_model
+
+    def _cache_key(self, current_llm, prompt: str, config: Dict) -> bytes:
+        """Cache key for a prompt on a given LLM, covering every model parameter the request sends"""
+        _, model_kwargs = self._split_config(current_llm, config)
+        model_kwargs.setdefault("temperature", self.temperature)
+        return llm_cache.make_key(self._model_name(current_llm), prompt, **model_kwargs)
+
+    def _split_config(self, current_llm, config: Dict) -> Tuple[Dict, Dict]:
+        """Split a config into the run config (callbacks, tags) and model request parameters"""
+        run_config = {key: value for key, value in config.items() if key not in MODEL_PARAM_KEYS}
+        model_kwargs = {
+            key: value for key, value in config.items()
+            if key in MODEL_PARAM_KEYS
+            and not (current_llm is self._primary_llm and key in OPENAI_ONLY_PARAM_KEYS)
+        }
+        return run_config, model_kwargs
+
+    def _response_text(self, response, current_llm) -> str:
+        """Extract the text of an LLM response and log which model produced it"""
+        response_text = str(response.content) if hasattr(response, 'content') else str(response)
+        logger.debug(f"LLM response: {response_text[:100]}...")
+        
+        # Log which model was used
+        logger.info(f"Response generated using model: {self._model_name(current_llm)}")
+        
+        return response_text
+    
     def invoke(self, prompt: str, config: Optional[Dict] = None) -> str:
         """Invoke LLM with error handling and fallback"""
         try:
             logger.debug(f"Invoking LLM with prompt: {prompt[:100]}...")
 
-            messages = [
-                SystemMessage(content=self.system_prompt),
-                {"role": "user", "content": prompt}
-            ]
+            messages = self._build_messages(prompt)
             
             # Merge configs
             invoke_config = {}
@@ -94,25 +151,126 @@ Always maintain a professional, academic tone while being helpful and clear."""
             # Get best available LLM
             current_llm = self.llm
             
-            response = current_llm.invoke(
-                messages,
-                config=invoke_config
-            )
+            cached = llm_cache.get(self._cache_key(current_llm, prompt, invoke_config))
+            if cached is not None:
+                return cached
             
-            response_text = str(response.content) if hasattr(response, 'content') else str(response)
-            logger.debug(f"LLM response: {response_text[:100]}...")
+            try:
+                run_config, model_kwargs = self._split_config(current_llm, invoke_config)
+                response = current_llm.invoke(
+                    messages,
+                    config=run_config,
+                    **model_kwargs
+                )
+            except Exception as e:
+                if current_llm is not self._primary_llm or not self._backup_llm:
+                    raise
+                self._mark_primary_failed(e)
+                current_llm = self._backup_llm
+                run_config, model_kwargs = self._split_config(current_llm, invoke_config)
+                response = current_llm.invoke(
+                    messages,
+                    config=run_config,
+                    **model_kwargs
+                )
+            else:
+                if current_llm is self._primary_llm:
+                    self._primary_healthy = True
             
-            # Log which model was used
-            model_used = (
-                self.primary_model if current_llm == self._primary_llm 
-                else self.backup_model
-            )
-            logger.info(f"Response generated using model: {model_used}")
+            response_text = self._response_text(response, current_llm)
+            llm_cache.set(self._cache_key(current_llm, prompt, invoke_config), response_text)
+            return response_text
             
+        except Exception as e:
+            logger.exception(f"Error invoking LLM: {e}")
+            raise
+
+    async def ainvoke(self, prompt: str, config: Optional[Dict] = None) -> str:
+        """Async variant of `invoke`, so several prompts can be in flight at once"""
+        try:
+            logger.debug(f"Invoking LLM asynchronously with prompt: {prompt[:100]}...")
+
+            messages = self._build_messages(prompt)
+            invoke_config = dict(config) if config else {}
+            current_llm = self.llm
+            
+            cached = llm_cache.get(self._cache_key(current_llm, prompt, invoke_config))
+            if cached is not None:
+                return cached
+            
+            try:
+                run_config, model_kwargs = self._split_config(current_llm, invoke_config)
+                response = await current_llm.ainvoke(
+                    messages,
+                    config=run_config,
+                    **model_kwargs
+                )
+            except Exception as e:
+                if current_llm is not self._primary_llm or not self._backup_llm:
+                    raise
+                self._mark_primary_failed(e)
+                current_llm = self._backup_llm
+                run_config, model_kwargs = self._split_config(current_llm, invoke_config)
+                response = await current_llm.ainvoke(
+                    messages,
+                    config=run_config,
+                    **model_kwargs
+                )
+            else:
+                if current_llm is self._primary_llm:
+                    self._primary_healthy = True
+            
+            response_text = self._response_text(response, current_llm)
+            llm_cache.set(self._cache_key(current_llm, prompt, invoke_config), response_text)
             return response_text
             
         except Exception as e:
             logger.exception(f"Error invoking LLM: {e}")
             raise
 
+    async def astream(self, prompt: str, config: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Async variant of `invoke` that yields the response text chunk by chunk as it is generated"""
+        try:
+            logger.debug(f"Streaming LLM response for prompt: {prompt[:100]}...")
+
+            messages = self._build_messages(prompt)
+            invoke_config = dict(config) if config else {}
+            current_llm = self.llm
+            
+            cached = llm_cache.get(self._cache_key(current_llm, prompt, invoke_config))
+            if cached is not None:
+                yield cached
+                return
+            
+            chunks = []
+            try:
+                run_config, model_kwargs = self._split_config(current_llm, invoke_config)
+                async for chunk in current_llm.astream(messages, config=run_config, **model_kwargs):
+                    if chunk.content:
+                        chunks.append(str(chunk.content))
+                        yield chunks[-1]
+            except Exception as e:
+                # Once text has reached the caller a retry would repeat it, so
+                # only fall back if the primary failed before its first chunk
+                if chunks or current_llm is not self._primary_llm or not self._backup_llm:
+                    raise
+                self._mark_primary_failed(e)
+                current_llm = self._backup_llm
+                run_config, model_kwargs = self._split_config(current_llm, invoke_config)
+                async for chunk in current_llm.astream(messages, config=run_config, **model_kwargs):
+                    if chunk.content:
+                        chunks.append(str(chunk.content))
+                        yield chunks[-1]
+            else:
+                if current_llm is self._primary_llm:
+                    self._primary_healthy = True
+            
+            response_text = "".join(chunks)
+            logger.info(f"Response streamed using model: {self._model_name(current_llm)}")
+            llm_cache.set(self._cache_key(current_llm, prompt, invoke_config), response_text)
+            
+        except Exception as e:
+            logger.exception(f"Error streaming LLM response: {e}")
+            raise
+
 llm_service = LLMService() 
\ No newline at end of file
@@ -5,34 +5,104 @@ when needed, and provides functionality to clear conversation threads
 entirely.
 """
 
-from typing import Dict, List
-from langchain_core.messages import BaseMessage
+from collections import deque
+from itertools import islice
+from threading import Lock
+from typing import Deque, Dict, Iterable, List, Tuple, Union
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from loguru import logger
 
+# Default upper bound on messages kept per thread; oldest messages are evicted first
+MAX_HISTORY = 200
+
+# Plain messages are stored as (type, content) pairs, a fraction of the size of
+# a pydantic message object, and rebuilt from these classes when read back
+_MESSAGE_CLASSES = {
+    "human": HumanMessage,
+    "ai": AIMessage,
+    "system": SystemMessage
+}
+
+StoredMessage = Union[Tuple[str, str], BaseMessage]
+
+def _compact(message: BaseMessage) -> StoredMessage:
+    """Reduce a message to a (type, content) pair if that loses nothing"""
+    if (
+        type(message) is _MESSAGE_CLASSES.get(message.type)
+        and isinstance(message.content, str)
+        and not message.additional_kwargs
+        and not message.response_metadata
+        and message.id is None
+        and message.name is None
+    ):
+        return message.type, message.content
+    return message
+
+def _expand(stored: StoredMessage) -> BaseMessage:
+    """Rebuild the message a stored entry was made from"""
+    if isinstance(stored, tuple):
+        message_type, content = stored
+        return _MESSAGE_CLASSES[message_type](content=content)
+    return stored
+
 class MemoryService:
-    def __init__(self):
-        self.conversations: Dict[str, List[BaseMessage]] = {}
+    def __init__(self, max_len: int = MAX_HISTORY):
+        self.max_len = max_len
+        self.conversations: Dict[str, Deque[StoredMessage]] = {}
+        # One lock per thread id, so writers to different conversations never wait on each other.
+        # A thread's lock is created and dropped together with its history, under _registry_lock
+        self._locks: Dict[str, Lock] = {}
+        self._registry_lock = Lock()
         
     def add_message(self, thread_id: str, message: BaseMessage):
         """Add a message to a conversation thread"""
-        if thread_id not in self.conversations:
-            self.conversations[thread_id] = []
-        self.conversations[thread_id].append(message)
-        logger.debug(f"Added message to thread {thread_id}. Total messages: {len(self.conversations[thread_id])}")
+        self.add_messages(thread_id, (message,))
+
+    def add_messages(self, thread_id: str, messages: Iterable[BaseMessage]):
+        """Add several messages to a conversation thread under a single lock acquisition"""
+        stored = [_compact(message) for message in messages]
+        with self._registry_lock:
+            conversation = self.conversations.get(thread_id)
+            if conversation is None:
+                conversation = self.conversations[thread_id] = deque(maxlen=self.max_len)
+                self._locks[thread_id] = Lock()
+            lock = self._locks[thread_id]
+        with lock:
+            conversation.extend(stored)
+            total = len(conversation)
+        logger.debug(f"Added messages to thread {thread_id}. Total messages: {total}")
         
     def get_messages(self, thread_id: str, last_k: int = None) -> List[BaseMessage]:
         """Get messages from a conversation thread"""
-        messages = self.conversations.get(thread_id, [])
+        with self._registry_lock:
+            conversation = self.conversations.get(thread_id)
+            lock = self._locks.get(thread_id)
+        if conversation is None:
+            logger.debug(f"Retrieved 0 messages from thread {thread_id}")
+            return []
+        # Copy under the lock: iterating the live deque while another request
+        # appends to it would raise "deque mutated during iteration"
+        with lock:
+            if last_k:
+                # deques don't slice; walk the tail from the right end in O(last_k)
+                stored = list(islice(reversed(conversation), last_k))
+                stored.reverse()
+            else:
+                stored = list(conversation)
+        # Message objects are built outside the lock
+        messages = [_expand(entry) for entry in stored]
         logger.debug(f"Retrieved {len(messages)} messages from thread {thread_id}")
-        if last_k:
-            messages = messages[-last_k:]
         return messages
         
     def clear_thread(self, thread_id: str):
         """Clear a conversation thread"""
-        if thread_id in self.conversations:
-            del self.conversations[thread_id]
-            logger.info(f"Cleared thread {thread_id}")
+        with self._registry_lock:
+            conversation = self.conversations.pop(thread_id, None)
+            # The lock goes with the history, so cleared thread ids leave nothing behind
+            self._locks.pop(thread_id, None)
+        if conversation is None:
+            return
+        logger.info(f"Cleared thread {thread_id}")
             
     def thread_exists(self, thread_id: str) -> bool:
         """Check if a thread exists"""
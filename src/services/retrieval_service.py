@@ -1,21 +1,40 @@
 """
 This module manages the document retrieval pipeline.
 It sets up and indexes documents using both BM25 keyword-based retrieval
- and FAISS for semantic search. The `rebuild` method allows the indexes
- to be updated with new documents. The module also includes functionality
+ and FAISS for semantic search. The `rebuild` method rebuilds the indexes
+ from a new set of documents, while `add_documents` indexes newly uploaded
+ documents on top of the existing ones. Built indexes are saved in the
+ background under a key of their corpus, so restarting over the same documents
+ loads instead of re-embedding them. The module also includes functionality
  for extracting relevant document snippets to improve the relevance of
  retrieved content.
 """
+import asyncio
 import os
+import hashlib
+import faiss
+import numpy as np
 import logging
-from typing import List
+import pickle
+import re
+import shutil
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from threading import Lock, RLock
+from typing import Dict, List, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.retrievers import BM25Retriever
 from langchain_openai import OpenAIEmbeddings
 from langchain.retrievers import EnsembleRetriever
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
-from src.utils.config import OPENAI_API_KEY
+from src.utils.config import OPENAI_API_KEY, INDEX_CACHE_DIR, EMBEDDING_CACHE_SIZE
+from src.utils.http_clients import http_client, async_http_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,52 +45,454 @@ text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
     separators=["\n\n", "\n", " ", ""]  # Try to split on paragraph breaks first
 )
 
+# Prefix of the per-corpus directories under the index cache directory
+INDEX_DIR_PREFIX = "index-"
+# Fitted BM25 index saved next to the FAISS index, so restoring doesn't refit it
+BM25_FILENAME = "bm25.pkl"
+
+def index_key(docs, model: str, quantization: Optional[str]) -> str:
+    """SHA-256 over the sorted document hashes and index settings, so any corpus change gets a new key"""
+    digest = hashlib.sha256(f"{model}\0{quantization}\0".encode("utf-8"))
+    for doc_hash in sorted(hashlib.sha256(doc.page_content.encode("utf-8")).digest() for doc in docs):
+        digest.update(doc_hash)
+    return digest.hexdigest()
+
+# Texts per embeddings API request
+EMBEDDING_BATCH_SIZE = 512
+# Embedding requests in flight at once when embedding asynchronously
+MAX_CONCURRENT_EMBEDDING_BATCHES = 4
+
+# Query embeddings kept for repeated questions
+QUERY_CACHE_SIZE = 4096
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends texts it has not embedded before to the provider"""
+
+    def __init__(self, embeddings: Embeddings, model: str, max_entries: int = EMBEDDING_CACHE_SIZE,
+                 max_queries: int = QUERY_CACHE_SIZE):
+        self._inner = embeddings
+        self._model = model
+        self.max_entries = max_entries
+        self.max_queries = max_queries
+        # float32 arrays match what FAISS stores and are far smaller than lists of Python floats.
+        # Uploads fill it from worker threads and the event loop, so it is only touched under _lock
+        self._cache: Dict[bytes, array] = {}
+        self._lock = Lock()
+        # Query embeddings are kept apart in an LRU, since repeated questions are the common case
+        self._query_cache: "OrderedDict[bytes, array]" = OrderedDict()
+        self._query_lock = Lock()
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self._model}\0{text}".encode("utf-8")).digest()
+
+    def _store(self, fresh: Dict[bytes, array]):
+        """Add new vectors to the cache, evicting the oldest entries first once it is full"""
+        with self._lock:
+            self._cache.update(fresh)
+            for key in list(islice(self._cache, max(0, len(self._cache) - self.max_entries))):
+                del self._cache[key]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        # Hits are taken out under the lock, so another thread evicting them can't lose them
+        with self._lock:
+            found = {key: self._cache[key] for key in keys if key in self._cache}
+        misses: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                misses.setdefault(key, text)
+
+        if misses:
+            vectors = self._inner.embed_documents(list(misses.values()))
+            fresh = {key: array('f', vector) for key, vector in zip(misses, vectors)}
+            found.update(fresh)
+            self._store(fresh)
+        logger.info(f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} embedded")
+
+        return [found[key].tolist() for key in keys]
+
+    async def aprefetch_documents(self, texts: List[str]):
+        """Embed uncached texts with one concurrent request per EMBEDDING_BATCH_SIZE texts,
+        so a following embed_documents call makes no API calls"""
+        with self._lock:
+            misses = list(dict.fromkeys(text for text in texts if self._key(text) not in self._cache))
+        if not misses:
+            return
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_EMBEDDING_BATCHES)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._inner.aembed_documents(batch)
+
+        batches = [misses[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(misses), EMBEDDING_BATCH_SIZE)]
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        self._store({
+            self._key(text): array('f', vector)
+            for batch, vectors in zip(batches, results)
+            for text, vector in zip(batch, vectors)
+        })
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await self.aprefetch_documents(texts)
+        # Everything is cached now; assembling the float lists is left to a worker thread
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, sending the ones not cached in a single request"""
+        keys = [self._key(text) for text in texts]
+        with self._query_lock:
+            found = {key: self._query_cache[key] for key in keys if key in self._query_cache}
+            for key in found:
+                self._query_cache.move_to_end(key)
+        misses = {key: text for key, text in zip(keys, texts) if key not in found}
+
+        if misses:
+            # OpenAI embeds queries and documents alike, so one batched documents call serves them
+            vectors = self._inner.embed_documents(list(misses.values()))
+            fresh = {key: array('f', vector) for key, vector in zip(misses, vectors)}
+            found.update(fresh)
+            with self._query_lock:
+                self._query_cache.update(fresh)
+                while len(self._query_cache) > self.max_queries:
+                    self._query_cache.popitem(last=False)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        with self._query_lock:
+            vector = self._query_cache.get(key)
+            if vector is not None:
+                self._query_cache.move_to_end(key)
+                return vector.tolist()
+
+        vector = array('f', self._inner.embed_query(text))
+        with self._query_lock:
+            self._query_cache[key] = vector
+            if len(self._query_cache) > self.max_queries:
+                self._query_cache.popitem(last=False)
+        return vector.tolist()
+
+# From this many chunks up, the vector index is an HNSW graph with sublinear
+# approximate search; below it an exact flat scan is fast and cheaper to build
+HNSW_MIN_CHUNKS = 512
+HNSW_M = 32  # Graph neighbours per vector
+HNSW_EF_CONSTRUCTION = 64
+HNSW_EF_SEARCH = 64  # Candidates explored per query, must stay above the retriever's k
+
+# Supported vector quantization modes; None picks one from the corpus size
+QUANTIZATION_MODES = ("none", "int8", "pq")
+# Above this many chunks, vectors are stored as int8 codes unless told otherwise
+INT8_MIN_CHUNKS = 1000
+# Product quantization splits each vector into sub-vectors of this many dimensions,
+# each stored as the 1-byte id of its nearest centroid in a trained codebook
+PQ_DIMS_PER_SUBVECTOR = 4
+PQ_MAX_NBITS = 8
+
+# Paragraphs mentioning any of these are kept as snippets. Substring match, as
+# before, so e.g. 'methods' and 'dataset' still count
+RESEARCH_TERM_RE = re.compile(
+    r"study|research|method|result|conclusion|analysis|finding|data|experiment",
+    re.IGNORECASE
+)
+
+# Chunks found only by BM25 have no calibrated similarity score; a neutral
+# score leaves them to the LLM grader
+UNSCORED_RELEVANCE = 0.5
+
 class RetrievalPipeline:
-    def __init__(self):
+    def __init__(self, quantization: Optional[str] = None, cache_dir: Optional[str] = None):
+        if quantization is not None and quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATION_MODES}")
+        self.quantization = quantization
+        # Where built indexes are saved and restored from; None disables persistence
+        self.cache_dir = cache_dir
         self.vectorstore = None
         self.keyword_retriever = None
         self.ensemble_retriever = None
         self.documents = []
         self.embeddings = None
+        self._doc_splits = []
+        # Unit-length chunk vectors, row i for _doc_splits[i]; only kept for exact flat indexes.
+        # It is a view into _buffer, which is reused across rebuilds and grown geometrically
+        self._matrix = None
+        self._buffer = None
+        # Bumped whenever the indexed corpus changes, for cache validation
+        self.version = 0
+        # Uploads index in worker threads while queries search on the event loop.
+        # _write_lock lets one rebuild/upload/reset run at a time; _lock is held by searches
+        # and by writers only while they change searchable state, so embedding and
+        # BM25 fitting never block queries
+        self._write_lock = RLock()
+        self._lock = RLock()
+        # Indexes are written to disk by one background thread, so saving never holds
+        # _write_lock or delays an upload. Only the newest scheduled save is written
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-save")
+        self._save_version = None
         
     def reset(self):
         """Completely reset the pipeline"""
-        self.vectorstore = None
-        self.keyword_retriever = None
-        self.ensemble_retriever = None
-        self.documents = []
-        self.embeddings = None
+        # An upload in progress finishes first, so it never finds its index gone mid-write
+        with self._write_lock, self._lock:
+            self.vectorstore = None
+            self.keyword_retriever = None
+            self.ensemble_retriever = None
+            self.documents = []
+            # The embeddings client and its cache hold no index state, so they survive resets
+            self._doc_splits = []
+            self._matrix = None
+            self.version += 1
         logger.info("Pipeline completely reset")
         
-    def rebuild(self, docs):
-        """Rebuild the pipeline with new documents"""
-        self.reset()
-
-        logger.info(f"Rebuilding retrieval pipeline with {len(docs)} documents")
-        for i, doc in enumerate(docs):
-            logger.info(f"Document {i}: {doc.metadata.get('source', 'No source')} - First 100 chars: {doc.page_content[:100]}...")
-
-        doc_splits = text_splitter.split_documents(docs)
-        logger.info(f"Split into {len(doc_splits)} chunks")
-
-        # Build FAISS vectorstore
-        self.embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-        self.vectorstore = FAISS.from_documents(
-            documents=doc_splits,
-            embedding=self.embeddings
+    def rebuild(self, docs, doc_splits: Optional[List[Document]] = None):
+        """Rebuild the pipeline with new documents, optionally already split into chunks"""
+        with self._write_lock:
+            # Searches fail fast with "no documents" until the new index is published
+            self.reset()
+
+            logger.info(f"Rebuilding retrieval pipeline with {len(docs)} documents")
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, doc in enumerate(docs):
+                    logger.debug(f"Document {i}: {doc.metadata.get('source', 'No source')} - First 100 chars: {doc.page_content[:100]}...")
+
+            if self._restore_index(docs):
+                return
+
+            if doc_splits is None:
+                doc_splits = text_splitter.split_documents(docs)
+            logger.info(f"Split into {len(doc_splits)} chunks")
+
+            # Build FAISS vectorstore from one batched embedding pass
+            texts, vectors, metadatas = self._embed_splits(doc_splits)
+            vectorstore = self._build_vectorstore(texts, vectors, metadatas)
+
+            self._publish(vectorstore, doc_splits, self._make_retrievers(vectorstore, doc_splits), docs)
+            self._persist_index()
+
+    def add_documents(self, docs, doc_splits: Optional[List[Document]] = None):
+        """Index new documents on top of the existing ones without re-embedding the current corpus"""
+        with self._write_lock:
+            if not self.has_documents():
+                self.rebuild(docs, doc_splits)
+                return
+
+            logger.info(f"Adding {len(docs)} documents to retrieval pipeline")
+            if doc_splits is None:
+                doc_splits = text_splitter.split_documents(docs)
+            logger.info(f"Split into {len(doc_splits)} chunks")
+
+            # Only the new chunks are embedded
+            texts, vectors, metadatas = self._embed_splits(doc_splits)
+            all_splits = self._doc_splits + doc_splits
+            # BM25 has no incremental insert, but refitting it is a local pass with no
+            # API calls; it runs before taking the search lock, so queries meanwhile
+            # keep using the old one
+            retrievers = self._make_retrievers(self.vectorstore, all_splits)
+
+            # FAISS and its docstore are updated in place, which is not safe during a search
+            with self._lock:
+                self.vectorstore.add_embeddings(
+                    text_embeddings=list(zip(texts, vectors)),
+                    metadatas=metadatas
+                )
+                if self._matrix is not None:
+                    self._store_rows(vectors, start=len(self._matrix))
+                self._publish(self.vectorstore, all_splits, retrievers, self.documents + list(docs))
+            self._persist_index()
+
+    def _publish(self, vectorstore, doc_splits, retrievers, docs):
+        """Make an index searchable, swapping in all of its parts at once"""
+        with self._lock:
+            self.vectorstore = vectorstore
+            self._doc_splits = doc_splits
+            self.keyword_retriever, self.ensemble_retriever = retrievers
+            self.documents = docs
+            # Bumped here as well as in reset, so status seen while a rebuild
+            # was still embedding never shares a version with the finished index
+            self.version += 1
+
+    async def aadd_documents(self, docs):
+        """Async variant of `add_documents` that embeds the new chunks in concurrent batches"""
+        doc_splits = await asyncio.to_thread(text_splitter.split_documents, docs)
+        # Fill the embedding cache concurrently, so indexing below makes no API calls
+        await self._get_embeddings().aprefetch_documents([split.page_content for split in doc_splits])
+        await asyncio.to_thread(self.add_documents, docs, doc_splits)
+
+    def _index_path(self, docs) -> str:
+        """Cache directory for the index of a corpus"""
+        key = index_key(docs, self._get_embeddings().model, self.quantization)
+        return os.path.join(self.cache_dir, f"{INDEX_DIR_PREFIX}{key}")
+
+    def _persist_index(self):
+        """Schedule a background save of the current index under its corpus key; called under _write_lock"""
+        if not self.cache_dir:
+            return
+        path = self._index_path(self.documents)
+        if os.path.isdir(path):
+            return
+        # add_documents updates the FAISS index in place, so it is copied here. The
+        # chunk list and BM25 index are replaced rather than changed, so references do
+        index = self.vectorstore.index
+        docstore_ids = [self.vectorstore.index_to_docstore_id[i] for i in range(index.ntotal)]
+        self._save_version = self.version
+        self._saver.submit(
+            self._save_index, path, self.version,
+            faiss.serialize_index(index), docstore_ids, self._doc_splits, self.keyword_retriever
+        )
+
+    def _save_index(self, path: str, version: int, index_bytes, docstore_ids: List[str],
+                    doc_splits: List[Document], keyword_retriever: BM25Retriever):
+        """Write an index snapshot to disk and drop indexes of older corpora; runs on the saver thread"""
+        if version != self._save_version:
+            # A newer index is already queued, so this one would be replaced at once
+            return
+        # Written to a temporary directory first, so a crash mid-save never leaves
+        # a partial index under a valid key
+        tmp_path = f"{path}.tmp"
+        try:
+            vectorstore = FAISS(
+                embedding_function=self._get_embeddings(),
+                index=faiss.deserialize_index(index_bytes),
+                docstore=InMemoryDocstore(dict(zip(docstore_ids, doc_splits))),
+                index_to_docstore_id=dict(enumerate(docstore_ids))
+            )
+            vectorstore.save_local(tmp_path)
+            with open(os.path.join(tmp_path, BM25_FILENAME), "wb") as f:
+                pickle.dump(keyword_retriever, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not save retrieval index to {path}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        for name in os.listdir(self.cache_dir):
+            stale = os.path.join(self.cache_dir, name)
+            if name.startswith(INDEX_DIR_PREFIX) and stale != path:
+                shutil.rmtree(stale, ignore_errors=True)
+        logger.info(f"Saved retrieval index to {path}")
+
+    def wait_for_saves(self):
+        """Block until every index save scheduled so far has finished"""
+        self._saver.submit(lambda: None).result()
+
+    def _restore_index(self, docs) -> bool:
+        """Load the saved index for exactly this corpus, if there is one, instead of embedding it"""
+        if not self.cache_dir:
+            return False
+        path = self._index_path(docs)
+        if not os.path.isdir(path):
+            return False
+        try:
+            # Index files are written by _save_index, not taken from users
+            vectorstore = FAISS.load_local(path, self._get_embeddings(), allow_dangerous_deserialization=True)
+        except Exception as e:
+            logger.warning(f"Could not load saved retrieval index from {path}, rebuilding: {e}")
+            return False
+
+        # Chunks come back from the saved docstore in index order, so row i still matches _doc_splits[i]
+        index = vectorstore.index
+        doc_splits = [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in range(index.ntotal)
+        ]
+        if type(index) in (faiss.IndexFlatL2, faiss.IndexFlatIP) and index.ntotal:
+            self._store_rows(index.reconstruct_n(0, index.ntotal), start=0)
+        try:
+            with open(os.path.join(path, BM25_FILENAME), "rb") as f:
+                keyword_retriever = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load saved BM25 index from {path}, refitting: {e}")
+            keyword_retriever = None
+        self._publish(vectorstore, doc_splits, self._make_retrievers(vectorstore, doc_splits, keyword_retriever), docs)
+        logger.info(f"Loaded saved retrieval index with {index.ntotal} chunks from {path}")
+        return True
+
+    def _get_embeddings(self) -> Embeddings:
+        """Create the cached embeddings client on first use and reuse it afterwards"""
+        if self.embeddings is None:
+            openai_embeddings = OpenAIEmbeddings(
+                api_key=OPENAI_API_KEY,
+                chunk_size=EMBEDDING_BATCH_SIZE,
+                http_client=http_client,
+                http_async_client=async_http_client
+            )
+            self.embeddings = CachedEmbeddings(openai_embeddings, openai_embeddings.model)
+        return self.embeddings
+
+    def _build_vectorstore(self, texts, vectors, metadatas) -> FAISS:
+        """Index embedded chunks, picking the FAISS index type from the corpus size and quantization setting"""
+        text_embeddings = list(zip(texts, vectors))
+        quantization = self.quantization or ("int8" if len(vectors) > INT8_MIN_CHUNKS else "none")
+        use_hnsw = len(vectors) >= HNSW_MIN_CHUNKS
+        if quantization == "pq" and not use_hnsw:
+            # Codebooks need at least 2**nbits training vectors, so small corpora get smaller ones
+            pq_nbits = min(PQ_MAX_NBITS, max(1, len(vectors).bit_length() - 1))
+            if len(vectors) < 2 ** pq_nbits:
+                logger.info(f"Too few chunks ({len(vectors)}) to train product quantization, using an exact flat index")
+                quantization = "none"
+        if quantization == "none" and not use_hnsw:
+            # Exact search over few vectors: _search scores them directly with one matrix product
+            self._store_rows(vectors, start=0)
+            return FAISS.from_embeddings(
+                text_embeddings=text_embeddings,
+                embedding=self._get_embeddings(),
+                metadatas=metadatas
+            )
+
+        self._matrix = None
+        dim = len(vectors[0])
+        logger.info(f"Building {'HNSW' if use_hnsw else 'flat'} index over {len(vectors)} chunks, quantization: {quantization}")
+        if quantization == "int8":
+            # One byte per dimension instead of four; ranges are learned per dimension
+            qtype = faiss.ScalarQuantizer.QT_8bit
+            index = faiss.IndexHNSWSQ(dim, qtype, HNSW_M) if use_hnsw else faiss.IndexScalarQuantizer(dim, qtype)
+        elif quantization == "pq":
+            # Candidates are scored with per-query lookup tables instead of full-precision dot products
+            pq_m = dim // PQ_DIMS_PER_SUBVECTOR if dim % PQ_DIMS_PER_SUBVECTOR == 0 else dim
+            if use_hnsw:
+                index = faiss.IndexHNSWPQ(dim, pq_m, HNSW_M)
+            else:
+                index = faiss.IndexPQ(dim, pq_m, pq_nbits)
+        else:
+            index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        if use_hnsw:
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+        if not index.is_trained:
+            index.train(np.asarray(vectors, dtype=np.float32))
+
+        vectorstore = FAISS(
+            embedding_function=self._get_embeddings(),
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={}
         )
+        vectorstore.add_embeddings(text_embeddings=text_embeddings, metadatas=metadatas)
+        return vectorstore
 
-        self.keyword_retriever = BM25Retriever.from_documents(doc_splits, similarity_top_k=6)
-        vector_retriever = self.vectorstore.as_retriever(
+    def _embed_splits(self, doc_splits):
+        """Embed all chunks with a single embed_documents call"""
+        texts = [split.page_content for split in doc_splits]
+        metadatas = [split.metadata for split in doc_splits]
+        vectors = self._get_embeddings().embed_documents(texts)
+        return texts, vectors, metadatas
+
+    def _make_retrievers(self, vectorstore, doc_splits,
+                         keyword_retriever: Optional[BM25Retriever] = None) -> Tuple[BM25Retriever, EnsembleRetriever]:
+        """Build the keyword and ensemble retrievers over a vectorstore and its chunks, reusing a fitted BM25 index if given"""
+        if keyword_retriever is None:
+            keyword_retriever = BM25Retriever.from_documents(doc_splits, similarity_top_k=6)
+        vector_retriever = vectorstore.as_retriever(
             search_type="similarity",  
             search_kwargs={"k": 6},
         )
 
-        self.ensemble_retriever = EnsembleRetriever(
-            retrievers=[vector_retriever, self.keyword_retriever], 
+        ensemble_retriever = EnsembleRetriever(
+            retrievers=[vector_retriever, keyword_retriever], 
             weights=[0.7, 0.3]  
         )
-        self.documents = docs
+        return keyword_retriever, ensemble_retriever
 
     def has_documents(self):
         """Check if documents are loaded and retrievable"""
@@ -81,37 +502,98 @@ class RetrievalPipeline:
             self.ensemble_retriever is not None
         )
 
-    def retrieve(self, question: str) -> List[str]:
-        """Enhanced retrieve method with logging"""
+    def retrieve(self, question: str, query_vector: Optional[List[float]] = None) -> List[str]:
+        """Enhanced retrieve method with logging; pass `query_vector` if the question is already embedded"""
+        return self.retrieve_batch([question], None if query_vector is None else [query_vector])[0]
+
+    def _require_documents(self):
+        """Raise if there is nothing to search"""
         if not self.has_documents():
             logger.warning("No documents loaded in retrieval pipeline")
             raise ValueError("No documents are currently loaded. Please upload documents first.")
+
+    def retrieve_batch(self, questions: List[str], query_vectors: Optional[List[List[float]]] = None) -> List[List[dict]]:
+        """Retrieve snippets for several questions, embedding and vector-scoring them together"""
+        self._require_documents()
+        if not questions:
+            return []
+        
+        if query_vectors is None:
+            # One embeddings request for every question not embedded recently
+            query_vectors = self._get_embeddings().embed_queries(questions)
+
+        # Only the vector search needs the lock: FAISS is updated in place, while
+        # retrievers are replaced whole, so the ones taken here stay consistent
+        with self._lock:
+            # A reset may have emptied the pipeline while the questions were embedded
+            self._require_documents()
+            ensemble_retriever = self.ensemble_retriever
+            vector_retriever = ensemble_retriever.retrievers[0]
+            search_kwargs = dict(vector_retriever.search_kwargs)
+            k = search_kwargs.pop("k", 4)
+            if self._matrix is not None and not search_kwargs:
+                vector_results = self._exact_search(query_vectors, k)
+            else:
+                vector_results = [
+                    self._vector_search(query_vector, k, search_kwargs)
+                    for query_vector in query_vectors
+                ]
         
+        return [
+            self._collect_snippets(question, scored, ensemble_retriever)
+            for question, scored in zip(questions, vector_results)
+        ]
+
+    def _vector_search(self, query_vector: List[float], k: int, search_kwargs: Dict) -> List[Tuple[Document, float]]:
+        """The search the vector retriever runs, by an already computed embedding and keeping relevance scores"""
+        search_kwargs = dict(search_kwargs)
+        score_threshold = search_kwargs.pop("score_threshold", None)
+        # FAISS's own conversion of its distances into [0, 1] relevance, as used by
+        # similarity_search_with_relevance_scores, which would embed the question again
+        relevance_score_fn = self.vectorstore._select_relevance_score_fn()
+        scored = [
+            (doc, relevance_score_fn(distance))
+            for doc, distance in self.vectorstore.similarity_search_with_score_by_vector(query_vector, k=k, **search_kwargs)
+        ]
+        if score_threshold is not None:
+            scored = [(doc, score) for doc, score in scored if score >= score_threshold]
+        return scored
+
+    def _collect_snippets(self, question: str, scored: List[Tuple[Document, float]],
+                          ensemble_retriever: EnsembleRetriever) -> List[dict]:
+        """Fuse a question's vector and keyword results and extract the relevant snippets"""
         logger.info(f"Retrieving documents for question: {question}")
-        docs = self.ensemble_retriever.invoke(question)
+        relevance = {doc.page_content: min(1.0, max(0.0, score)) for doc, score in scored}
+        keyword_retriever = ensemble_retriever.retrievers[1]
+        # Fuse the two result lists exactly as EnsembleRetriever.invoke would
+        docs = ensemble_retriever.weighted_reciprocal_rank([
+            [doc for doc, _ in scored],
+            keyword_retriever.invoke(question)
+        ])
         logger.info(f"Retrieved {len(docs)} documents")
         
         # Extract relevant snippets and their sources
+        question_words = frozenset(question.lower().split())
+        # Per-document previews are only built when debug logging is on
+        debug = logger.isEnabledFor(logging.DEBUG)
         relevant_content = []
         for doc in docs:
-            score = 1.0
-            logger.info(f"Processing document with score: {score}")
+            score = relevance.get(doc.page_content, UNSCORED_RELEVANCE)
 
             content = doc.page_content
             source = doc.metadata.get('source', 'Unknown source')
-            logger.info(f"Document content preview: {content[:100]}...")
+            if debug:
+                logger.debug(f"Processing document with score {score}, content preview: {content[:100]}...")
 
             paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
 
-            question_words = set(question.lower().split())
             relevant_parts = []
             
             for paragraph in paragraphs:
-                if (len(question_words & set(paragraph.lower().split())) > 1 or
-                    any(term in paragraph.lower() for term in [
-                        'study', 'research', 'method', 'result', 'conclusion',
-                        'analysis', 'finding', 'data', 'experiment'
-                    ])):
+                # The regex scan allocates nothing, so try it before lowercasing
+                # and splitting the paragraph for the word-overlap test
+                if (RESEARCH_TERM_RE.search(paragraph) or
+                    len(question_words.intersection(paragraph.lower().split())) > 1):
                     relevant_parts.append(paragraph)
             
             if relevant_parts:
@@ -122,7 +604,8 @@ class RetrievalPipeline:
                     'source': source,
                     'score': score
                 })
-                logger.info(f"Added relevant snippet: {snippet[:100]}...")
+                if debug:
+                    logger.debug(f"Added relevant snippet: {snippet[:100]}...")
         
         if not relevant_content:
             if docs:
@@ -130,7 +613,7 @@ class RetrievalPipeline:
                 relevant_content = [{
                     'content': first_doc[:1000],
                     'source': docs[0].metadata.get('source', 'Unknown source'),
-                    'score': 1.0
+                    'score': relevance.get(first_doc, UNSCORED_RELEVANCE)
                 }]
                 logger.info("No specific snippets found, using document introduction")
             else:
@@ -138,33 +621,57 @@ class RetrievalPipeline:
         
         return relevant_content
 
+    def _store_rows(self, vectors, start: int):
+        """Write vectors as unit-length rows from row `start` of the reusable buffer"""
+        end = start + len(vectors)
+        dim = len(vectors[0])
+        buffer = self._buffer
+        if buffer is None or end > len(buffer) or buffer.shape[1] != dim:
+            # Double the capacity so repeated uploads don't copy the matrix each time
+            capacity = max(2 * len(buffer) if buffer is not None else 0, end)
+            grown = np.empty((capacity, dim), dtype=np.float32)
+            if start:
+                grown[:start] = self._matrix
+            buffer = self._buffer = grown
+
+        rows = buffer[start:end]
+        rows[...] = vectors
+        rows /= np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+        self._matrix = buffer[:end]
+
+    def embed_query(self, question: str) -> List[float]:
+        """Embed a question, reusing the vector if it was embedded recently"""
+        return self._get_embeddings().embed_query(question)
+
+    def _exact_search(self, vectors: List[List[float]], k: int) -> List[List[Tuple[Document, float]]]:
+        """Top-k chunks by cosine similarity for each query vector, from one BLAS matrix product"""
+        queries = np.asarray(vectors, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        # (chunks x queries): a single SGEMM however many questions there are
+        cosines = self._matrix @ queries.T
+
+        # Partition for the k largest in place of negating (and copying) the scores;
+        # a full sort is only needed over those k
+        n = len(cosines)
+        k = min(k, n)
+        if k < n:
+            top = np.argpartition(cosines, n - k, axis=0)[n - k:]
+        else:
+            top = np.broadcast_to(np.arange(n)[:, None], cosines.shape)
+
+        results = []
+        for column in range(cosines.shape[1]):
+            scores = cosines[:, column]
+            ranked = top[:, column]
+            ranked = ranked[np.argsort(scores[ranked])[::-1]]
+            # FAISS scores unit vectors as 1 - squared L2 distance / sqrt(2); matching
+            # it keeps scores comparable whichever search path ran
+            relevance = 1.0 - (2.0 - 2.0 * scores[ranked]) / np.sqrt(2.0)
+            results.append([(self._doc_splits[i], float(score)) for i, score in zip(ranked, relevance)])
+        return results
+
     def query(self, question: str) -> List[str]:
         """Alias for retrieve method to maintain compatibility"""
         return self.retrieve(question)
 
-    def save_vectorstore(self, path: str):
-        """Save the FAISS vectorstore to disk"""
-        if self.vectorstore:
-            self.vectorstore.save_local(path)
-
-    def load_vectorstore(self, path: str):
-        """Load the FAISS vectorstore from disk"""
-        if os.path.exists(path):
-            embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-            self.vectorstore = FAISS.load_local(path, embeddings)
-            vector_retriever = self.vectorstore.as_retriever(
-                search_type="similarity_score_threshold",
-                search_kwargs={"score_threshold": 0.5, "k": 2},
-            )
-            if self.documents:  # Only recreate ensemble if we have documents
-                keyword_retriever = BM25Retriever.from_documents(
-                    text_splitter.split_documents(self.documents), 
-                    similarity_top_k=2
-                )
-                self.ensemble_retriever = EnsembleRetriever(
-                    retrievers=[vector_retriever, keyword_retriever],
-                    weights=[0.2, 0.8]
-                )
-
-
-retrieval_pipeline = RetrievalPipeline()
+retrieval_pipeline = RetrievalPipeline(cache_dir=INDEX_CACHE_DIR or None)
@@ -21,8 +21,16 @@ LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY")
 LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY")
 LANGFUSE_HOST = os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
 
+# Server
+API_RELOAD = os.getenv("API_RELOAD", "false").lower() == "true"
+
 # Docs
 DOCS_FOLDER = "src/docs"
+# Chunk embeddings kept in memory so re-indexing known text makes no API calls;
+# at 1536 dimensions each entry is about 6 KB
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+# Built retrieval indexes are saved here so restarts skip re-embedding; empty disables
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", os.path.expanduser("~/.cache/research-agent"))
 
 DEFAULT_USER_ID = "default_user"
 DEFAULT_THREAD_ID = "default_thread"
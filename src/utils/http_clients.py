@@ -0,0 +1,20 @@
+"""
+The `http_clients` module provides the HTTP clients shared by every
+LLM and embeddings client in the application. Sharing one connection
+pool lets calls to OpenAI and TogetherAI reuse keep-alive connections
+instead of each client paying for its own TCP and TLS handshakes.
+"""
+
+import httpx
+
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200)
+
+# The sync client serves `invoke`, the async one `ainvoke`/`astream`. HTTP/2
+# multiplexes concurrent requests (e.g. per-document grading) over one connection
+http_client = httpx.Client(limits=HTTP_LIMITS, http2=True)
+async_http_client = httpx.AsyncClient(limits=HTTP_LIMITS, http2=True)
+
+async def close_http_clients():
+    """Close both shared clients and their pooled connections"""
+    http_client.close()
+    await async_http_client.aclose()
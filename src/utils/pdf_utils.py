@@ -6,19 +6,29 @@ and `load_pdf` to load a single PDF file. Additionally,
 it contains asynchronous functions for processing uploaded PDF files.
 """
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
+import aiofiles
 from fastapi import UploadFile
 from langchain.docstore.document import Document
 from langchain_community.document_loaders import PyPDFLoader
 from src.utils.config import DOCS_FOLDER
 
-async def process_uploaded_pdf(file: UploadFile) -> List[Document]:
+UPLOAD_CHUNK_SIZE = 1 << 16
+
+# Upper bound on PDFs parsed concurrently in worker threads
+PARSE_CONCURRENCY = os.cpu_count() or 4
+
+async def process_uploaded_pdf(file: UploadFile, parse_semaphore: asyncio.Semaphore) -> List[Document]:
     """
     Process an uploaded PDF file and return the extracted documents
     
     Args:
         file (UploadFile): The uploaded PDF file
+        parse_semaphore (asyncio.Semaphore): Bounds parses running at once;
+            created per request, since a semaphore is bound to one event loop
         
     Returns:
         List[Document]: List of extracted documents from the PDF
@@ -28,24 +38,16 @@ async def process_uploaded_pdf(file: UploadFile) -> List[Document]:
     
     # Save the uploaded file
     file_path = os.path.join(DOCS_FOLDER, file.filename)
-    content = await file.read()
-    
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Stream to disk in chunks so the whole upload is never held in memory
+    async with aiofiles.open(file_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
     
     try:
-        # Load and process the PDF
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
-        
-        # Concatenate pages belonging to the same document
-        if documents:
-            combined_doc = documents[0]
-            for doc in documents[1:]:
-                combined_doc.page_content += "\n\n" + doc.page_content
-            return [combined_doc]
-        
-        return []
+        # Parsing is blocking, so run it off the event loop; the semaphore
+        # keeps a large batch upload from starting every parse at once
+        async with parse_semaphore:
+            return await asyncio.to_thread(_load_combined_pdf, file_path)
         
     except Exception as e:
         # Clean up the file if processing fails
@@ -53,6 +55,23 @@ async def process_uploaded_pdf(file: UploadFile) -> List[Document]:
             os.remove(file_path)
         raise Exception(f"Error processing PDF: {str(e)}")
 
+def _load_combined_pdf(file_path: str) -> List[Document]:
+    """Load a PDF and concatenate its pages into a single document"""
+    loader = PyPDFLoader(file_path)
+    documents = loader.load()
+    
+    # Concatenate pages belonging to the same document
+    if documents:
+        return [combine_pages(documents)]
+    
+    return []
+
+def combine_pages(pages: List[Document]) -> Document:
+    """Merge a PDF's pages into its first page document in a single join"""
+    combined_doc = pages[0]
+    combined_doc.page_content = "\n\n".join(page.page_content for page in pages)
+    return combined_doc
+
 def load_pdfs_from_directory(directory: str) -> List[Document]:
     """
     Load all PDFs from a directory
@@ -66,20 +85,24 @@ def load_pdfs_from_directory(directory: str) -> List[Document]:
     if not os.path.exists(directory):
         return []
         
+    pdf_files = [filename for filename in os.listdir(directory) if filename.endswith('.pdf')]
+    if not pdf_files:
+        return []
+    
+    # Parse PDFs in parallel; results are collected in directory order
     documents = []
-    for filename in os.listdir(directory):
-        if filename.endswith('.pdf'):
-            file_path = os.path.join(directory, filename)
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+        futures = {
+            filename: executor.submit(load_pdf, os.path.join(directory, filename))
+            for filename in pdf_files
+        }
+        for filename, future in futures.items():
             try:
-                loader = PyPDFLoader(file_path)
-                docs = loader.load()
+                docs = future.result()
                 
                 # Combine pages of the same document
                 if docs:
-                    combined_doc = docs[0]
-                    for doc in docs[1:]:
-                        combined_doc.page_content += "\n\n" + doc.page_content
-                    documents.append(combined_doc)
+                    documents.append(combine_pages(docs))
                     
             except Exception as e:
                 print(f"Error loading {filename}: {str(e)}")
@@ -0,0 +1,34 @@
+from src.services.answer_cache import AnswerCache
+
+def test_exact_hit_and_miss():
+    """Test storing and retrieving an answer by key"""
+    cache = AnswerCache()
+    key = ("what is ai?", 1)
+
+    assert cache.get(key) is None
+    cache.set(key, ("AI is artificial intelligence.", []))
+    assert cache.get(key) == ("AI is artificial intelligence.", [])
+
+EVIDENCE = frozenset({("paper.pdf", 1), ("paper.pdf", 2)})
+
+def test_similar_question_reuses_answer():
+    """Test that a near-identical question embedding is served from the cache"""
+    cache = AnswerCache(threshold=0.97)
+    cache.set(("what is ai?", 1), ("answer", []), vector=[1.0, 0.0, 0.0], version=1, evidence=EVIDENCE)
+
+    assert cache.get_similar([0.99, 0.05, 0.0], version=1, evidence=EVIDENCE) == ("answer", [])
+    assert cache.get_similar([0.0, 1.0, 0.0], version=1, evidence=EVIDENCE) is None
+
+def test_similar_lookup_requires_same_retrieved_chunks():
+    """Test that a similar question drawing on different chunks is not served another question's answer"""
+    cache = AnswerCache(threshold=0.97)
+    cache.set(("how is bert pretrained?", 1), ("answer", []), vector=[1.0, 0.0, 0.0], version=1, evidence=EVIDENCE)
+
+    assert cache.get_similar([0.99, 0.05, 0.0], version=1, evidence=frozenset({("paper.pdf", 3)})) is None
+
+def test_similar_lookup_respects_corpus_version():
+    """Test that answers cached for an older corpus are not reused"""
+    cache = AnswerCache()
+    cache.set(("what is ai?", 1), ("answer", []), vector=[1.0, 0.0], version=1, evidence=EVIDENCE)
+
+    assert cache.get_similar([1.0, 0.0], version=2, evidence=EVIDENCE) is None
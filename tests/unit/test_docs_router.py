@@ -0,0 +1,54 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.routers import docs_router
+from src.services.retrieval_service import CachedEmbeddings, retrieval_pipeline
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """The shared pipeline with local fake embeddings and no index cache on disk"""
+    monkeypatch.setattr(retrieval_pipeline, "cache_dir", None)
+    monkeypatch.setattr(retrieval_pipeline, "embeddings", CachedEmbeddings(DeterministicFakeEmbedding(size=8), "fake"))
+    retrieval_pipeline.reset()
+    yield retrieval_pipeline
+    retrieval_pipeline.reset()
+
+def test_status_not_modified_until_documents_change(test_client, fake_pipeline):
+    """Test that a repeated status poll gets 304 only while the status is unchanged"""
+    first = test_client.get("/api/status")
+    assert first.status_code == 200
+    assert first.json()["has_documents"] is False
+    etag = first.headers["etag"]
+
+    assert test_client.get("/api/status", headers={"If-None-Match": etag}).status_code == 304
+
+def test_status_etag_changes_when_rebuild_completes(test_client, mock_documents, fake_pipeline):
+    """Test that status seen while a rebuild is in progress is not reused once it finishes"""
+    # What a poll sees after rebuild's reset but before the documents are indexed
+    fake_pipeline.reset()
+    during = test_client.get("/api/status")
+    assert during.json()["has_documents"] is False
+
+    fake_pipeline.rebuild(mock_documents)
+    after = test_client.get("/api/status", headers={"If-None-Match": during.headers["etag"]})
+    assert after.status_code == 200
+    assert after.json() == {"has_documents": True, "document_count": 2}
+
+def test_upload_rejects_duplicate_filenames(test_client, fake_pipeline, monkeypatch):
+    """Test that a repeated filename in one upload is reported instead of parsed twice"""
+    parsed = []
+
+    async def fake_process(file, parse_semaphore):
+        async with parse_semaphore:
+            parsed.append(file.filename)
+            return [Document(page_content=f"A study in {file.filename}.", metadata={"source": file.filename})]
+
+    monkeypatch.setattr(docs_router, "process_uploaded_pdf", fake_process)
+    files = [("files", (name, b"%PDF-1.4", "application/pdf")) for name in ("a.pdf", "b.pdf", "a.pdf")]
+    response = test_client.post("/api/docs/upload", files=files)
+
+    assert response.status_code == 200
+    assert parsed == ["a.pdf", "b.pdf"]
+    details = response.json()["details"]
+    assert [entry["filename"] for entry in details["successful"]] == ["a.pdf", "b.pdf"]
+    assert details["failed"] == [{"filename": "a.pdf", "error": "Duplicate filename in this upload"}]
@@ -1,5 +1,7 @@
+import asyncio
 import pytest
-from src.services.graph_service import GraphService
+from src.services import graph_service as graph_module
+from src.services.graph_service import GraphService, needs_llm_grade
 from langchain.schema import HumanMessage, AIMessage
 
 def test_process_question_no_documents(graph_service):
@@ -32,4 +34,62 @@ def test_process_question_with_history(graph_service, mock_documents):
 def test_format_error_response(graph_service, recursion_count, expected_contains):
     """Test error response formatting"""
     response = graph_service.format_error_response("Test error", recursion_count)
-    assert expected_contains in response.lower()
\ No newline at end of file
+    assert expected_contains in response.lower()
+
+
+@pytest.mark.parametrize("response,expected", [
+    ('{"scores": [0.9, 0.1, 0.5]}', [0.9, 0.1, 0.5]),
+    ('Here are the grades:\n{"scores": [1, 0]}\nDone.', [1.0, 0.0, None]),
+    ('{"scores": [0.7]}', [0.7, None, None]),
+    ('{"scores": [0.1, 0.2, 0.3, 0.4]}', [0.1, 0.2, 0.3]),
+    ('{"scores": ["0.6", "high", null]}', [0.6, None, None]),
+    ('{"scores": [1.5, -0.2, NaN]}', [None, None, None]),
+    ('{"scores": "0.5"}', [None, None, None]),
+    ('{"grades": [0.5, 0.5, 0.5]}', [None, None, None]),
+    ('{"scores": [0.5, 0.5', [None, None, None]),
+    ('[0.5, 0.5, 0.5]', [None, None, None]),
+    ('', [None, None, None]),
+])
+def test_parse_scores(response, expected):
+    """Test that batch grading replies map to one score per document, None where unusable"""
+    assert GraphService._parse_scores(response, 3) == expected
+
+@pytest.mark.parametrize("score,expected", [
+    (0.0, False),
+    (0.19, False),
+    (0.2, True),
+    (0.21, True),
+    (0.5, True),
+    (0.79, True),
+    (0.8, True),
+    (0.81, False),
+    (1.0, False),
+])
+def test_needs_llm_grade_band(score, expected):
+    """Test that only retrieval scores inside the ambiguous band are sent to the LLM grader"""
+    assert needs_llm_grade({"score": score}) is expected
+
+def test_agrade_documents_grades_one_digit_per_document(monkeypatch):
+    """Test that the default async grading maps each digit reply to a grade and skips confident documents"""
+    replies = {"ambiguous": "3", "garbled": "high"}
+    prompts = []
+
+    async def fake_ainvoke(prompt, config=None):
+        prompts.append(prompt)
+        assert config == graph_module.GRADE_CONFIG
+        return next(reply for name, reply in replies.items() if name in prompt)
+
+    monkeypatch.setattr(graph_module.llm_service, "ainvoke", fake_ainvoke)
+    state = {
+        "question": "What is attention?",
+        "rewritten_question": None,
+        "documents": [
+            {"content": "ambiguous excerpt", "source": "a.pdf", "score": 0.5},
+            {"content": "garbled excerpt", "source": "b.pdf", "score": 0.4},
+            {"content": "confident excerpt", "source": "c.pdf", "score": 0.9},
+        ]
+    }
+    graded = asyncio.run(GraphService().agrade_documents(state))["graded_docs"]
+
+    assert len(prompts) == 2
+    assert {doc["source"]: doc["grade"] for doc in graded} == {"a.pdf": 0.75, "b.pdf": 0.4, "c.pdf": 0.9}
@@ -0,0 +1,42 @@
+import pytest
+from src.services.llm_cache import LLMCache
+
+def test_cache_hit_and_miss():
+    """Test storing and retrieving a cached response"""
+    cache = LLMCache()
+    key = LLMCache.make_key("gpt-4o-mini", "What is AI?", temperature=0)
+
+    assert cache.get(key) is None
+    cache.set(key, "AI is artificial intelligence.")
+    assert cache.get(key) == "AI is artificial intelligence."
+
+@pytest.mark.parametrize("other", [
+    ("gpt-4o-mini", "What is AI?", 0.7, None),
+    ("gpt-4o-mini", "What is AI?", 0, 100),
+    ("meta-llama/Llama-3.3-70B-Instruct-Turbo", "What is AI?", 0, None),
+    ("gpt-4o-mini", "What is ML?", 0, None),
+])
+def test_cache_key_covers_settings(other):
+    """Test that model, prompt and generation settings all change the key"""
+    base = LLMCache.make_key("gpt-4o-mini", "What is AI?", temperature=0)
+    model, prompt, temperature, max_tokens = other
+    assert LLMCache.make_key(model, prompt, temperature=temperature, max_tokens=max_tokens) != base
+
+def test_cache_key_covers_other_request_params():
+    """Test that extra request parameters such as logit_bias change the key, whatever their order"""
+    base = LLMCache.make_key("gpt-4o-mini", "Grade this", temperature=0, max_tokens=1, logit_bias={15: 5, 16: 5})
+    assert LLMCache.make_key("gpt-4o-mini", "Grade this", temperature=0, max_tokens=1, logit_bias={16: 5, 15: 5}) == base
+    assert LLMCache.make_key("gpt-4o-mini", "Grade this", temperature=0, max_tokens=1, logit_bias={15: 5}) != base
+    assert LLMCache.make_key("gpt-4o-mini", "Grade this", temperature=0, max_tokens=1) != base
+
+def test_cache_evicts_least_recently_used():
+    """Test LRU eviction once the cache is full"""
+    cache = LLMCache(maxsize=2)
+    cache.set(b"a", "1")
+    cache.set(b"b", "2")
+    cache.get(b"a")
+    cache.set(b"c", "3")
+
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == "1"
+    assert cache.get(b"c") == "3"
@@ -21,4 +21,16 @@ def test_llm_invoke_with_system_prompt(llm_service):
 def test_llm_invoke_with_config(llm_service, config):
     """Test LLM invocation with different configs"""
     response = llm_service.invoke("Test prompt", config)
-    assert isinstance(response, str) 
\ No newline at end of file
+    assert isinstance(response, str) 
+
+def test_split_config_passes_sampling_params_to_model(llm_service):
+    """Test that sampling params are separated from the run config"""
+    config = {"temperature": 0, "max_tokens": 1, "logit_bias": {15: 5}, "tags": ["grade"]}
+
+    run_config, model_kwargs = llm_service._split_config(llm_service._backup_llm, config)
+    assert run_config == {"tags": ["grade"]}
+    assert model_kwargs == {"temperature": 0, "max_tokens": 1, "logit_bias": {15: 5}}
+
+    # logit_bias token ids are OpenAI specific
+    _, model_kwargs = llm_service._split_config(llm_service._primary_llm, config)
+    assert "logit_bias" not in model_kwargs
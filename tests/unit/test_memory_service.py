@@ -1,5 +1,6 @@
 import pytest
-from src.services.memory_service import MemoryService
+from concurrent.futures import ThreadPoolExecutor
+from src.services.memory_service import MAX_HISTORY, MemoryService
 from langchain.schema import HumanMessage, AIMessage
 
 def test_add_and_get_messages(memory_service):
@@ -38,4 +39,62 @@ def test_clear_thread(memory_service):
     )
     
     memory_service.clear_thread(thread_id)
-    assert not memory_service.thread_exists(thread_id) 
\ No newline at end of file
+    assert not memory_service.thread_exists(thread_id) 
+
+def test_history_is_bounded(memory_service):
+    """Test that old messages are evicted once a thread exceeds MAX_HISTORY"""
+    thread_id = "test-thread"
+    for i in range(MAX_HISTORY + 5):
+        memory_service.add_message(
+            thread_id,
+            HumanMessage(content=f"Message {i}")
+        )
+
+    messages = memory_service.get_messages(thread_id)
+    assert len(messages) == MAX_HISTORY
+    assert messages[0].content == "Message 5"
+
+def test_concurrent_writes_keep_every_message(memory_service):
+    """Test that concurrent writers to one thread don't drop messages"""
+    thread_id = "test-thread"
+
+    def write(i):
+        memory_service.add_messages(thread_id, [
+            HumanMessage(content=f"Question {i}"),
+            AIMessage(content=f"Answer {i}")
+        ])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(50)))
+
+    messages = memory_service.get_messages(thread_id)
+    assert len(messages) == 100
+    # Each exchange is written under one lock, so pairs stay adjacent
+    for question, answer in zip(messages[::2], messages[1::2]):
+        assert question.content.split()[1] == answer.content.split()[1]
+
+def test_messages_round_trip_with_types(memory_service):
+    """Test that stored messages come back with their type, content and extra fields"""
+    thread_id = "test-thread"
+    tool_call_reply = AIMessage(content="Done", additional_kwargs={"refusal": None, "extra": 1})
+    memory_service.add_messages(thread_id, [
+        HumanMessage(content="Question"),
+        AIMessage(content="Answer"),
+        tool_call_reply
+    ])
+
+    messages = memory_service.get_messages(thread_id)
+    assert [type(message) for message in messages] == [HumanMessage, AIMessage, AIMessage]
+    assert [message.content for message in messages] == ["Question", "Answer", "Done"]
+    assert messages[2].additional_kwargs == tool_call_reply.additional_kwargs
+
+def test_clear_thread_drops_its_lock(memory_service):
+    """Test that clearing threads leaves no per-thread state behind"""
+    for i in range(10):
+        memory_service.add_message(f"thread-{i}", HumanMessage(content="Question"))
+        memory_service.get_messages(f"thread-{i}")
+        memory_service.clear_thread(f"thread-{i}")
+    memory_service.get_messages("never-written")
+
+    assert not memory_service.conversations
+    assert not memory_service._locks
@@ -0,0 +1,54 @@
+import pytest
+from src.routers.query_router import SNIPPET_MAX_BYTES, SNIPPET_MAX_CHARS, make_snippet, prefilter_route
+
+def test_make_snippet_keeps_short_content():
+    """Test that content under the limits is returned unchanged"""
+    assert make_snippet("A short abstract.") == "A short abstract."
+
+def test_make_snippet_truncates_to_max_chars():
+    """Test that long ASCII content is cut to SNIPPET_MAX_CHARS characters"""
+    content = "word " * SNIPPET_MAX_CHARS
+    snippet = make_snippet(content)
+    assert len(snippet) == SNIPPET_MAX_CHARS
+    assert content.startswith(snippet)
+
+@pytest.mark.parametrize("char", ["é", "€", "😀"])
+def test_make_snippet_caps_utf8_bytes_on_character_boundary(char):
+    """Test that wide characters are trimmed to SNIPPET_MAX_BYTES without splitting a character"""
+    snippet = make_snippet(char * SNIPPET_MAX_CHARS)
+    encoded = snippet.encode("utf-8")
+    assert len(encoded) <= SNIPPET_MAX_BYTES
+    # Only whole characters survive, as many as fit in the byte budget
+    assert snippet == char * min(SNIPPET_MAX_CHARS, SNIPPET_MAX_BYTES // len(char.encode("utf-8")))
+
+@pytest.mark.parametrize("question", [
+    "What was my first question?",
+    "What was the last question I asked?",
+    "How many questions have I asked?",
+    "Show my chat history",
+    "What did I ask earlier?",
+    "Summarize this conversation",
+])
+def test_prefilter_routes_conversation_questions_to_memory(question):
+    """Test that questions about this conversation skip the LLM router"""
+    route = prefilter_route(question)
+    assert route is not None
+    assert route.query_type == "memory"
+
+@pytest.mark.parametrize("question", [
+    "How many questions does MMLU contain?",
+    "What was the first question posed in the Turing paper?",
+    "How many times is attention applied per layer?",
+    "How do chatbots use conversation history?",
+    "What did the authors ask participants?",
+    "How is this chat model evaluated?",
+    "What does my conversation analysis study show?",
+])
+def test_prefilter_defers_research_questions(question):
+    """Test that research questions using memory-like wording are left to the LLM router"""
+    assert prefilter_route(question) is None
+
+@pytest.mark.parametrize("question", ["Hello!", "thanks", "What can you do?"])
+def test_prefilter_routes_greetings_to_general(question):
+    """Test that greetings and capability questions are routed as general"""
+    assert prefilter_route(question).query_type == "general"
@@ -1,5 +1,39 @@
 import pytest
-from src.services.retrieval_service import RetrievalPipeline
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from src.services.retrieval_service import CachedEmbeddings, RetrievalPipeline
+from langchain_community.retrievers import BM25Retriever
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+class BlockingEmbeddings(Embeddings):
+    """Local fake embeddings that, once armed, hold document requests until released"""
+    def __init__(self):
+        self.inner = DeterministicFakeEmbedding(size=8)
+        self.armed = False
+        self.started = Event()
+        self.release = Event()
+
+    def embed_documents(self, texts):
+        if self.armed:
+            self.started.set()
+            self.release.wait(timeout=10)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Local fake embeddings that count the requests a real provider would get"""
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
 
 def test_pipeline_initialization(retrieval_pipeline):
     """Test retrieval pipeline initialization"""
@@ -12,6 +46,13 @@ def test_pipeline_rebuild(retrieval_pipeline, mock_documents):
     assert retrieval_pipeline.has_documents()
     assert len(retrieval_pipeline.documents) == 2
 
+def test_pipeline_add_documents(retrieval_pipeline, mock_documents):
+    """Test adding documents on top of an existing index"""
+    retrieval_pipeline.rebuild(mock_documents[:1])
+    retrieval_pipeline.add_documents(mock_documents[1:])
+    assert retrieval_pipeline.has_documents()
+    assert len(retrieval_pipeline.documents) == 2
+
 def test_retrieve_with_no_documents(retrieval_pipeline):
     """Test retrieval with no documents loaded"""
     with pytest.raises(ValueError):
@@ -38,4 +79,151 @@ def test_retrieve_different_queries(
     """Test retrieval with different queries"""
     retrieval_pipeline.rebuild(mock_documents)
     results = retrieval_pipeline.retrieve(question)
-    assert len([r for r in results if question.lower() in r.lower()]) >= expected_count 
\ No newline at end of file
+    assert len([r for r in results if question.lower() in r.lower()]) >= expected_count 
+
+def test_pipeline_rejects_unknown_quantization():
+    """Test that an unsupported quantization mode fails fast"""
+    with pytest.raises(ValueError):
+        RetrievalPipeline(quantization="int4")
+
+def test_pipeline_rebuild_int8(mock_documents):
+    """Test rebuilding with int8 quantized vectors"""
+    pipeline = RetrievalPipeline(quantization="int8")
+    pipeline.rebuild(mock_documents)
+    assert pipeline.has_documents()
+    assert len(pipeline.retrieve("machine learning")) > 0
+
+def test_pipeline_rebuild_pq(mock_documents):
+    """Test rebuilding with product quantized vectors"""
+    pipeline = RetrievalPipeline(quantization="pq")
+    pipeline.rebuild(mock_documents)
+    assert pipeline.has_documents()
+    assert len(pipeline.retrieve("neural networks")) > 0
+
+def test_query_embeddings_are_cached():
+    """Test that repeated queries are embedded once"""
+    inner = CountingEmbeddings(size=8)
+    embeddings = CachedEmbeddings(inner, "fake", max_queries=1)
+    first = embeddings.embed_query("machine learning")
+    assert embeddings.embed_query("machine learning") == pytest.approx(first)
+    assert inner.calls == 1
+
+    # The oldest query is evicted once the cache is full
+    embeddings.embed_query("neural networks")
+    embeddings.embed_query("machine learning")
+    assert inner.calls == 3
+
+def test_retrieve_batch_matches_retrieve(retrieval_pipeline, mock_documents):
+    """Test that batched retrieval returns the same snippets as one query at a time"""
+    retrieval_pipeline.rebuild(mock_documents)
+    questions = ["machine learning", "neural networks"]
+
+    batched = retrieval_pipeline.retrieve_batch(questions)
+    assert batched == [retrieval_pipeline.retrieve(question) for question in questions]
+
+def test_rebuild_restores_saved_index(tmp_path, mock_documents, monkeypatch):
+    """Test that a rebuild over an unchanged corpus loads the saved index instead of embedding or refitting BM25"""
+    first = RetrievalPipeline(cache_dir=str(tmp_path))
+    first.embeddings = CachedEmbeddings(CountingEmbeddings(size=8), "fake")
+    first.rebuild(mock_documents)
+    first.wait_for_saves()
+
+    def refit(*args, **kwargs):
+        raise AssertionError("BM25 was refitted instead of loaded")
+
+    monkeypatch.setattr(BM25Retriever, "from_documents", refit)
+    inner = CountingEmbeddings(size=8)
+    second = RetrievalPipeline(cache_dir=str(tmp_path))
+    second.embeddings = CachedEmbeddings(inner, "fake")
+    second.rebuild(list(reversed(mock_documents)))
+    assert second.has_documents()
+    assert inner.calls == 0
+    assert len(second.retrieve("machine learning")) > 0
+    assert len(list(tmp_path.iterdir())) == 1
+
+def test_retrieve_with_precomputed_query_vector(retrieval_pipeline, mock_documents):
+    """Test that passing an already computed question embedding gives the same snippets"""
+    retrieval_pipeline.rebuild(mock_documents)
+    question = "neural networks"
+
+    query_vector = retrieval_pipeline.embed_query(question)
+    assert retrieval_pipeline.retrieve(question, query_vector=query_vector) == retrieval_pipeline.retrieve(question)
+
+def test_searches_during_uploads_see_consistent_index(mock_documents):
+    """Test that retrieving while documents are added from other threads never fails"""
+    pipeline = RetrievalPipeline()
+    pipeline.embeddings = CachedEmbeddings(DeterministicFakeEmbedding(size=8), "fake")
+    pipeline.rebuild(mock_documents)
+    uploads = [
+        [Document(page_content=f"Upload {i} reports a study of attention.", metadata={"source": f"upload{i}.pdf"})]
+        for i in range(20)
+    ]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        added = [pool.submit(pipeline.add_documents, docs) for docs in uploads]
+        searched = [pool.submit(pipeline.retrieve, "study of attention") for _ in range(20)]
+        for future in added + searched:
+            future.result()
+
+    assert len(pipeline.documents) == len(mock_documents) + len(uploads)
+    assert len(pipeline._doc_splits) == pipeline.vectorstore.index.ntotal
+
+def test_approximate_search_uses_precomputed_query_vector(mock_documents):
+    """Test that a FAISS-searched pipeline embeds nothing when given the question's vector"""
+    inner = CountingEmbeddings(size=8)
+    pipeline = RetrievalPipeline(quantization="int8")
+    pipeline.embeddings = CachedEmbeddings(inner, "fake", max_queries=0)
+    pipeline.rebuild(mock_documents)
+    question = "machine learning"
+    query_vector = inner.embed_query(question)
+
+    calls = inner.calls
+    assert len(pipeline.retrieve(question, query_vector=query_vector)) > 0
+    assert inner.calls == calls
+
+def test_pipeline_rebuild_pq_single_chunk():
+    """Test that a corpus too small to train product quantization falls back to a flat index"""
+    pipeline = RetrievalPipeline(quantization="pq")
+    pipeline.embeddings = CachedEmbeddings(DeterministicFakeEmbedding(size=8), "fake")
+    pipeline.rebuild([Document(page_content="A one page study of attention.", metadata={"source": "one.pdf"})])
+    assert pipeline.has_documents()
+    assert len(pipeline.retrieve("attention study")) > 0
+
+def test_reset_waits_for_upload_in_progress(mock_documents):
+    """Test that a reset during an upload runs after it instead of dropping the index mid-write"""
+    inner = BlockingEmbeddings()
+    pipeline = RetrievalPipeline()
+    pipeline.embeddings = CachedEmbeddings(inner, "fake")
+    pipeline.rebuild(mock_documents)
+    inner.armed = True
+    upload = [Document(page_content="A new study of attention.", metadata={"source": "new.pdf"})]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        added = pool.submit(pipeline.add_documents, upload)
+        assert inner.started.wait(timeout=10)
+        reset = pool.submit(pipeline.reset)
+        # The upload is still embedding, so the reset must not have run yet
+        assert not reset.done()
+        assert pipeline.has_documents()
+        inner.release.set()
+        added.result()
+        reset.result()
+
+    assert not pipeline.has_documents()
+    assert pipeline.documents == []
+
+def test_uploads_save_index_in_background(tmp_path, mock_documents):
+    """Test that the index saved after uploads covers every document and replaces older saves"""
+    pipeline = RetrievalPipeline(cache_dir=str(tmp_path))
+    pipeline.embeddings = CachedEmbeddings(DeterministicFakeEmbedding(size=8), "fake")
+    pipeline.rebuild(mock_documents[:1])
+    pipeline.add_documents(mock_documents[1:])
+    pipeline.wait_for_saves()
+    assert len(list(tmp_path.iterdir())) == 1
+
+    inner = CountingEmbeddings(size=8)
+    restored = RetrievalPipeline(cache_dir=str(tmp_path))
+    restored.embeddings = CachedEmbeddings(inner, "fake")
+    restored.rebuild(mock_documents)
+    assert inner.calls == 0
+    assert restored.vectorstore.index.ntotal == pipeline.vectorstore.index.ntotal